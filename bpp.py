@@ -7,9 +7,11 @@ and discounts for bulk builds for the game Star Sonata.
 # Project stuff
 from bpp_screen import BppScreen    # GUI
 from bpp_logic import BppLogic      # Logic module
+from bpp_worker import CalculationWorker    # Background calculations
 
 # Kivy stuff
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.uix.settings import SettingsWithSidebar
 
 
@@ -24,21 +26,109 @@ class BPP(App):
         self.version = 0.21
         self.icon = 'BPP+_icon.png'
         self.logic = BppLogic()
+        # Calculations run in the background, results are handed back to the UI thread
+        self.worker = CalculationWorker(self.logic, post=self.post_result)
 
         # Prepare settings
         self.settings_cls = SettingsWithSidebar
 
         # Prepare screen (only declared, initialised at .run()
         self.screen = None
+        # Blueprint selected on the builds tab
+        self.selected_bp = None
+        # State of the blueprint table: filters, last blueprint shown (name, id) and whether all are shown
+        self.browse_filters = {}
+        self.browse_total = 0
+        self.browse_after = None
+        self.browse_done = True
 
     def build(self):
         # Give neat name to app
         self.title = 'BPP+ (Blue Photon Processor+)'
         # Prepare GUI
         self.screen = BppScreen()
-        self.screen.populate_dropdown(self.logic.get_all_blueprints())
+        self.screen.show_blueprints(self.logic.get_all_blueprints())
+        self.worker.start()
+        self.screen.set_sources(self.logic.get_sources())
+        self.browse_blueprints()
+        # Kit calculators show the modules of their kit type
+        for panel in (self.screen.ids['prod_kit'], self.screen.ids['colony_kit']):
+            panel.show_modules(self.logic.get_kit_modules(panel.kit))
         return self.screen
 
+    @staticmethod
+    def post_result(callback, result):
+        """
+        Hands a result of the calculation worker to a callback on the UI thread (at the next frame).
+
+        Args:
+            callback (callable): Function to call with the result.
+            result (any): Result of the calculation.
+        """
+        Clock.schedule_once(lambda dt: callback(result))
+
+    def search_blueprints(self, query):
+        """
+        Narrows down the blueprint list to blueprints matching a query.
+
+        Args:
+            query (str): (Part of) the blueprint name to look for.
+        """
+        self.screen.show_blueprints(self.logic.search_blueprints(query))
+
+    def browse_blueprints(self, page_size=100):
+        """
+        Shows the first page of the blueprint table with the filters as filled in.
+
+        Args:
+            page_size (int): Number of blueprints per page.
+        """
+        if self.screen is None:
+            return  # Filters change while the screen is built, the first page is shown once it is ready
+        self.browse_filters = self.screen.get_browse_filters()
+        self.browse_total = self.logic.count_blueprints(self.browse_filters)
+        self.browse_after = None
+        self.browse_done = False
+        rows = self.logic.browse_blueprints(self.browse_filters, limit=page_size)
+        self.update_browse_state(rows, page_size)
+        self.screen.show_blueprint_page(rows, self.browse_total)
+
+    def load_more_blueprints(self, page_size=100):
+        """
+        Adds the next page to the blueprint table, if there are blueprints left.
+
+        Args:
+            page_size (int): Number of blueprints per page.
+        """
+        if self.browse_done:
+            return
+        rows = self.logic.browse_blueprints(self.browse_filters, self.browse_after, page_size)
+        self.update_browse_state(rows, page_size)
+        self.screen.show_blueprint_page(rows, self.browse_total, append=True)
+
+    def update_browse_state(self, rows, page_size):
+        """
+        Remembers where the next page of the blueprint table starts.
+
+        Args:
+            rows (list): Blueprints of the page just loaded.
+            page_size (int): Number of blueprints requested.
+        """
+        if rows:
+            self.browse_after = (rows[-1]['blueprint'], rows[-1]['id'])
+        # A page that is not full is the last one
+        self.browse_done = len(rows) < page_size
+
+    def where_used(self, material, transitive=False):
+        """
+        Lists the blueprints requiring a material or component.
+
+        Args:
+            material (str): Name of the material or component.
+            transitive (bool): Whether to include blueprints requiring it through intermediate products.
+        """
+        self.screen.show_where_used(self.logic.where_used(material.strip(), transitive))
+
     def calculate_cost(self, bp_name):
         """
         Calculates the cost of a specified blueprint in basic commodities.
@@ -49,8 +139,25 @@ class BPP(App):
         Returns:
 
         """
-        # Propagate cost dictionary for display
-        self.screen.update_cost_dict(self.logic.calculate_cost(bp_name))
+        self.selected_bp = bp_name
+        self.screen.select_blueprint(bp_name)
+        self.calculate_bulk_cost(self.screen.get_build_amount())
+
+    def calculate_bulk_cost(self, number):
+        """
+        Calculates the cost of building the selected blueprint in bulk, in basic commodities.
+
+        Args:
+            number (int): Amount of products that need to be built.
+        """
+        # Propagate cost dictionary for display (empty if nothing is selected yet)
+        if self.selected_bp:
+            # Supersedes the calculation of any amount typed before
+            self.worker.submit('cost', 'calculate_bulk_cost', (self.selected_bp, number),
+                               callback=self.screen.update_cost)
+        else:
+            self.worker.cancel('cost')
+            self.screen.update_cost({})
 
     def calculate_exe_setup(self, **kwargs):
         """
@@ -75,8 +182,77 @@ class BPP(App):
             else:
                 nums[com] = int(n)
 
-        # Pass information on to logic module and return setup dictionary to UI
-        self.screen.update_setup(self.logic.calculate_exe_setup(**nums))
+        # Pass information on to logic module and show setup in UI
+        self.worker.submit('exe', 'calculate_exe_setup', kwargs=nums, callback=self.screen.update_setup)
+
+    def optimise_exe_setup(self, cap='', sort_by='Output per worker', **kwargs):
+        """
+        Searches the best configurations of an ExE kit, given skill level, kit tech and maximum extraction slots.
+
+        Args:
+            cap (str, optional): Maximum number of workers on the kit (no limit if empty).
+            sort_by (str, optional): Ranking of the setups as shown in the UI, 'Output per worker' or 'Credits'.
+            kwargs (any, optional): ExE information, see calculate_exe_setup.
+        """
+        # Convert all given strings into numbers
+        nums = {com: int(n) if n else 0 for com, n in kwargs.items()}
+        sort_by = sort_by.lower().replace(' ', '_')
+
+        # Pass information on to logic module and show best setups in UI
+        self.worker.submit('exe', 'optimise_exe_setup',
+                           kwargs=dict(nums, cap=int(cap) if cap else None, sort_by=sort_by),
+                           callback=lambda setups: self.screen.update_optimised_setups(setups, sort_by=sort_by))
+
+    def calculate_kit_setup(self, panel, tech=''):
+        """
+        Calculates the setup of a kit with the modules filled in on its calculator.
+
+        Args:
+            panel (KitPanel): Calculator of the kit.
+            tech (str, optional): Tech level of the kit.
+        """
+        self.worker.submit('kit ' + panel.kit, 'calculate_kit_setup',
+                           (panel.kit, int(tech) if tech else 16, panel.get_modules()),
+                           callback=panel.show_setup, error_callback=lambda e: panel.show_error(str(e)))
+
+    def set_instrumentation(self, enabled):
+        """
+        Switches collection of timings and cache hits on or off.
+
+        Args:
+            enabled (bool): Whether to collect.
+        """
+        self.logic.set_instrumentation(enabled)
+        self.show_statistics()
+
+    def show_statistics(self):
+        """ Shows collected timings and cache hits on the settings tab. """
+        self.screen.update_statistics(self.logic.get_statistics())
+
+    def export_statistics(self, file_name='bpp_stats.json'):
+        """
+        Writes collected timings and cache hits to a JSON file.
+
+        Args:
+            file_name (str): Location of the file.
+        """
+        self.logic.export_statistics(file_name)
+        self.print_debug_text('Statistics written to ' + file_name)
+
+    def check_db_version(self):
+        """ Applies available database patches and shows the outcome on the settings tab. """
+        try:
+            result = self.logic.check_db_version()
+        except ValueError as e:
+            self.screen.update_db_version(self.get_db_version(), 'Patch rejected: {}'.format(e))
+            return
+        if result is None:
+            self.screen.update_db_version(self.get_db_version(), 'Database is up to date.')
+            return
+        self.screen.update_db_version(result['to'], 'Updated from {} to {}: {} added, {} changed, {} removed, '
+                                      '{} customised blueprint(s) kept.'.format(
+                                          result['from'], result['to'], result['added'], result['changed'],
+                                          result['removed'], result['kept']))
 
     @staticmethod
     def print_debug_text(text):
@@ -92,6 +268,7 @@ class BPP(App):
 
     def on_stop(self):
         """Whenever the application is closed, ensure it quits gracefully."""
+        self.worker.stop()  # Finish current calculation first
         self.logic.stop()   # Signal logic module to wrap up
         return True
 
@@ -0,0 +1,93 @@
+# Project stuff
+from bpp_db import BppDb
+from kit_setup import KitSetup
+
+# Standard library stuff
+from concurrent.futures import ProcessPoolExecutor
+from csv import DictReader
+from os import cpu_count
+
+# Columns of a celestial body, with the commodity of every slot column
+SLOT_COLUMNS = {'met': 'metals', 'nuc': 'nuclear waste', 'sil': 'silicon', 'oat': 'space oats', 'bao': 'baobabs'}
+
+# Kit setup module of a worker process (every process has its own database connection)
+_kits = None
+
+
+def read_bodies(file_name):
+    """
+    Reads celestial bodies from a CSV file with columns body, tech, ee, met, nuc, sil, oat and bao.
+    Missing values default to tech 16, EE level 30 and no slots.
+
+    Args:
+        file_name (str): Location of the CSV file.
+
+    Returns:
+        list: Bodies as dictionaries with body (name), tech, ee and slots (per commodity),
+            or body and error if a row is invalid.
+    """
+    bodies = []
+    with open(file_name, 'r', newline='') as f:
+        for i, row in enumerate(DictReader(f)):
+            name = (row.get('body') or '').strip() or 'Body {}'.format(i + 1)
+            try:
+                slots = {commod: int(row[col]) for col, commod in SLOT_COLUMNS.items() if (row.get(col) or '').strip()}
+                bodies.append({'body': name,
+                               'tech': int(row.get('tech') or 16),
+                               'ee': int(row.get('ee') or 30),
+                               'slots': {commod: n for commod, n in slots.items() if n > 0}})
+            except ValueError as e:
+                bodies.append({'body': name, 'error': str(e)})
+    return bodies
+
+
+def _init_worker(db_file):
+    """
+    Prepares a worker process with its own database connection.
+
+    Args:
+        db_file (str): Name (and location) of the database file.
+    """
+    global _kits
+    db = BppDb(db_file)
+    db.create_connection()
+    _kits = KitSetup(db)
+
+
+def _plan_body(body):
+    """
+    Calculates the ExE kit setup of one celestial body (in a worker process).
+
+    Args:
+        body (dict): Body as read by read_bodies.
+
+    Returns:
+        dict: Row of the result table.
+    """
+    if 'error' in body:
+        return body
+    setup = _kits.exe_setup(body['tech'], body['ee'], body['slots'])
+    if setup is None:
+        return {'body': body['body'], 'error': 'Base tech is too low!'}
+    return dict(setup.as_dict(), body=body['body'], ee=body['ee'])
+
+
+def plan_bodies(db_file, bodies, processes=None):
+    """
+    Calculates ExE kit setups of many celestial bodies in parallel.
+
+    Args:
+        db_file (str): Name (and location) of the database file (opened by every worker process).
+        bodies (list): Bodies as read by read_bodies.
+        processes (int, optional): Number of worker processes (defaults to the number of cores).
+
+    Returns:
+        list: One row per body (in the given order) with body, ee and all fields of its setup
+            (see ExeSetup.as_dict), or body and error.
+    """
+    if processes is None:
+        processes = cpu_count() or 1
+    # Send bodies in chunks, as a single body is too little work to be worth a round trip
+    chunksize = max(1, len(bodies) // (4 * processes))
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(db_file,)) as pool:
+        return list(pool.map(_plan_body, bodies, chunksize=chunksize))
@@ -0,0 +1,235 @@
+"""Blue Photon Processor+ benchmarks
+
+Generates a synthetic catalog in the blueprints schema and times the main database and cost operations on it.
+Results are written as JSON, so runs of different releases can be compared:
+
+    python -m bpp_bench --blueprints 10000 --depth 6 --fan-out 3 --output bench.json
+
+Everything runs in a temporary directory, the database and dump of the application are not touched.
+"""
+
+# Project stuff
+from bpp_db import BLUEPRINT_COLUMNS, INSERT_BLUEPRINT
+from bpp_logic import BppLogic, NUMERIC_COLUMNS
+
+# Standard library stuff
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from io import StringIO
+from json import dumps
+from os import chdir, getcwd, remove
+from os.path import isfile
+from platform import platform, python_version
+from random import Random
+from sqlite3 import connect
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import sys
+
+# Basic commodities used by the deepest level of recipes
+BASIC_COMMODITIES = ('Metals', 'Nuclear Waste', 'Silicon', 'Space Oats', 'Baobabs', 'Energy', 'Gems', 'Plastics')
+# Variables the application requires
+VARIABLES = (('db_version', '0.0'), ('exe_level_bonus', '0.02'), ('worker_ration_consumption', '0.6'))
+
+
+def synthetic_blueprints(n, depth=5, fan_out=3, seed=0):
+    """
+    Generates blueprints arranged in levels, where every blueprint requires products of the next level
+    and the deepest level only requires basic commodities.
+
+    Args:
+        n (int): Number of blueprints.
+        depth (int): Number of levels (length of the longest recipe chain).
+        fan_out (int): Number of different materials per phase (init and per) of every blueprint.
+        seed (int): Seed of the random generator, the same seed gives the same catalog.
+
+    Returns:
+        list: Blueprints as dictionaries with all columns of BLUEPRINT_COLUMNS.
+    """
+    rng = Random(seed)
+    names = ['Synthetic Part {:06d}'.format(i) for i in range(n)]
+    # Level of a blueprint is its index modulo depth, so every level is (about) equally large
+    levels = [names[level::depth] for level in range(depth)]
+
+    blueprints = []
+    for i, name in enumerate(names):
+        level = i % depth
+        pool = levels[level + 1] if level + 1 < depth else BASIC_COMMODITIES
+        bp = {col: None for col in BLUEPRINT_COLUMNS}
+        bp.update(blueprint=name, tech=rng.randint(1, 20), source='Synthetic', bp_cost=rng.randint(1, 10 ** 6),
+                  weight=rng.randint(1, 100), size=rng.randint(1, 100), manhours=rng.randint(1, 1000),
+                  max_workforce=rng.randint(1, 100), init_credits=rng.randint(0, 10 ** 5),
+                  per_credits=rng.randint(0, 10 ** 4), products=name, products_n=str(rng.randint(1, 3)))
+        for phase in ('init', 'per'):
+            materials = rng.sample(pool, min(fan_out, len(pool)))
+            bp[phase + '_materials'] = '[{}]'.format(', '.join(materials))
+            bp[phase + '_materials_n'] = '[{}]'.format(', '.join(str(rng.randint(1, 50)) for _ in materials))
+            bp[phase + '_materials_discount'] = '[{}]'.format(', '.join(rng.choice(('True', 'False'))
+                                                                        for _ in materials))
+        blueprints.append(bp)
+    return blueprints
+
+
+def write_dump(dump_file, blueprints):
+    """
+    Writes blueprints into a dump in the format of bpp_db.sql.
+
+    Args:
+        dump_file (str): Location of the dump to write.
+        blueprints (list): Blueprints as generated by synthetic_blueprints.
+    """
+    con = connect(':memory:')
+    columns = ', '.join('{} {}'.format(col, 'INTEGER' if col in NUMERIC_COLUMNS else 'TEXT')
+                        for col in BLUEPRINT_COLUMNS)
+    con.execute('CREATE TABLE blueprints ({})'.format(columns))
+    con.execute('CREATE TABLE bpp_variables (variable TEXT PRIMARY KEY, value TEXT)')
+    con.executemany('INSERT INTO bpp_variables (variable, value) VALUES (?, ?)', VARIABLES)
+    con.executemany(INSERT_BLUEPRINT, ([bp[col] for col in BLUEPRINT_COLUMNS] for bp in blueprints))
+    con.commit()
+    with open(dump_file, 'w') as df:
+        for line in con.iterdump():
+            df.write(line + '\n')
+    con.close()
+
+
+def timed(results, name, repeat, func, n=1):
+    """
+    Times a function and records the median, fastest and slowest duration.
+
+    Args:
+        results (dict): Results to record the timing in (by name).
+        name (str): Name of the benchmark.
+        repeat (int): Number of times to run the function.
+        func (callable): Function to time, without arguments. Called once per repetition.
+        n (int): Number of operations per call, to also report the time per operation.
+
+    Returns:
+        any: Result of the last call.
+    """
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = perf_counter()
+        result = func()
+        durations.append(perf_counter() - start)
+    results[name] = {'seconds': median(durations), 'min': min(durations), 'max': max(durations),
+                     'repeat': repeat, 'n': n, 'seconds_per_op': median(durations) / n}
+    return result
+
+
+def run_benchmarks(n=10000, depth=5, fan_out=3, repeat=3, samples=100, seed=0):
+    """
+    Runs all benchmarks on a synthetic catalog, in a temporary directory.
+
+    Args:
+        n (int): Number of blueprints in the catalog.
+        depth (int): Number of recipe levels.
+        fan_out (int): Number of materials per phase of every blueprint.
+        repeat (int): Number of repetitions of every benchmark (median is reported).
+        samples (int): Number of blueprints to calculate costs for and to insert.
+        seed (int): Seed of the catalog generator.
+
+    Returns:
+        dict: Parameters, environment and results (seconds per benchmark).
+    """
+    results = {}
+    cwd = getcwd()
+    with TemporaryDirectory() as tmp:
+        chdir(tmp)
+        try:
+            blueprints = synthetic_blueprints(n, depth, fan_out, seed)
+            write_dump('bench.sql', blueprints)
+            # Top level blueprints, which have the deepest recipe trees
+            rng = Random(seed)
+            top = rng.sample([bp['blueprint'] for bp in blueprints[::depth]], min(samples, len(blueprints[::depth])))
+
+            def init():
+                with redirect_stdout(StringIO()):   # Keep initialisation messages out of the results
+                    logic = BppLogic('bench.sql')
+                logic.db.close_connection()
+
+            def init_dump():
+                # Start without snapshot and database, like a first start of the application
+                for file_name in ('bench.sql.snap', 'bpp.db', 'bpp.db-wal', 'bpp.db-shm'):
+                    if isfile(file_name):
+                        remove(file_name)
+                init()
+
+            timed(results, 'init_from_dump', repeat, init_dump)
+            init()  # Creates the snapshot
+            timed(results, 'init_from_snapshot', repeat, init)
+
+            with redirect_stdout(StringIO()):
+                logic = BppLogic('bench.sql')
+            # Cold benchmarks include loading the catalog of blueprints into memory, warm ones reuse it
+            def all_cold():
+                logic.blueprints_changed()
+                return logic.get_all_blueprints()
+            timed(results, 'get_all_blueprints_cold', repeat, all_cold)
+            timed(results, 'get_all_blueprints_warm', repeat, logic.get_all_blueprints)
+
+            def cost_cold():
+                logic.blueprints_changed()
+                for bp_name in top:
+                    logic.calculate_cost(bp_name)
+            timed(results, 'calculate_cost_cold', repeat, cost_cold, len(top))
+
+            def cost_warm():
+                for bp_name in top:
+                    logic.calculate_cost(bp_name)
+            timed(results, 'calculate_cost_warm', repeat, cost_warm, len(top))
+
+            counter = iter(range(10 ** 9))
+
+            def insert():
+                for bp in rng.sample(blueprints, min(samples, n)):
+                    bp = {col: value for col, value in bp.items() if col not in ('blueprint', 'products')}
+                    name = 'Inserted Part {:06d}'.format(next(counter))
+                    logic.add_blueprint(dict(bp, name=name, products=name))
+            timed(results, 'insert_blueprint', repeat, insert, min(samples, n))
+
+            timed(results, 'dump', repeat, lambda: logic.db.dump('out.sql'))
+            logic.db.close_connection()
+        finally:
+            chdir(cwd)
+
+    return {'parameters': {'blueprints': n, 'depth': depth, 'fan_out': fan_out, 'repeat': repeat,
+                           'samples': samples, 'seed': seed},
+            'environment': {'python': python_version(), 'platform': platform()},
+            'results': results}
+
+
+def main(argv=None):
+    """
+    Command line entry point.
+
+    Args:
+        argv (list, optional): Command line arguments (defaults to those of the process).
+
+    Returns:
+        int: Exit code.
+    """
+    parser = ArgumentParser(prog='python -m bpp_bench', description='Benchmark BPP+ on a synthetic catalog.')
+    parser.add_argument('--blueprints', type=int, default=10000, help='Number of blueprints (default: 10000).')
+    parser.add_argument('--depth', type=int, default=5, help='Number of recipe levels (default: 5).')
+    parser.add_argument('--fan-out', type=int, default=3, help='Materials per phase of a blueprint (default: 3).')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetitions of every benchmark (default: 3).')
+    parser.add_argument('--samples', type=int, default=100,
+                        help='Blueprints to calculate costs for and to insert (default: 100).')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the catalog generator (default: 0).')
+    parser.add_argument('--output', default=None, help='File to write results to (default: stdout).')
+    args = parser.parse_args(argv)
+
+    report = dumps(run_benchmarks(args.blueprints, args.depth, args.fan_out, args.repeat, args.samples, args.seed),
+                   indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Blue Photon Processor+ command line interface
+
+Runs cost and ExE calculations without starting the GUI. Jobs are read one per line from a file or stdin:
+
+    cost <blueprint> [<amount>]
+    order <blueprint> [<amount>]; <blueprint> [<amount>]; ...
+    exe [tech=<tech>] [ee=<level>] [met=<slots>] [nuc=<slots>] [sil=<slots>] [oat=<slots>] [bao=<slots>]
+    kit <kit> [tech=<tech>] ["<module>=<amount>" ...]
+
+Blueprint names containing spaces may be quoted, but that is not required. Empty lines and lines starting
+with # are skipped. Every job results in one line of JSON on stdout.
+
+Alternatively, --sweep writes a table of ExE kit requirements over all extractor techs, EE levels and slot counts.
+
+Example:
+    echo "cost Steel Girder 10" | python -m bpp_cli
+    python -m bpp_cli --sweep exe_table.csv --max-slots 50
+"""
+
+# Project stuff
+from bpp_logic import BppLogic
+
+# Standard library stuff
+from argparse import ArgumentParser, FileType
+from contextlib import redirect_stdout
+from json import dumps
+from shlex import split
+import sys
+
+# Arguments of the exe job, in positional order
+EXE_ARGS = ('tech', 'ee', 'met', 'nuc', 'sil', 'oat', 'bao')
+
+
+def parse_build(args):
+    """
+    Reads a blueprint name with an optional amount (last argument).
+
+    Args:
+        args (list): Arguments of a job, e.g. ['Steel', 'Girder', '10'].
+
+    Returns:
+        tuple: (blueprint name, amount)
+    """
+    n = 1
+    if len(args) > 1 and args[-1].isdigit():
+        n = int(args.pop())
+    if not args:
+        raise ValueError('No blueprint given')
+    return ' '.join(args), n
+
+
+def run_job(logic, line):
+    """
+    Performs one calculation job.
+
+    Args:
+        logic (BppLogic): Logic module to calculate with.
+        line (str): Job description, e.g. 'cost Steel Girder 10' or 'exe tech=16 met=3'.
+
+    Returns:
+        dict: Result of the job.
+
+    Raises:
+        ValueError: If the job cannot be understood.
+    """
+    command, *args = split(line)
+    if command == 'cost':
+        bp_name, n = parse_build(args)
+        return {'blueprint': bp_name, 'n': n,
+                'cost': logic.calculate_bulk_cost(bp_name, n)}
+    if command == 'order':
+        # Builds are separated by semicolons
+        order = [parse_build(split(build)) for build in ' '.join(args).split(';') if build.strip()]
+        return {'order': order, 'cost': logic.calculate_build_order(order)}
+    if command == 'exe':
+        kwargs = {}
+        for i, arg in enumerate(args):
+            if '=' in arg:
+                key, value = arg.split('=', 1)
+            elif i < len(EXE_ARGS):
+                key, value = EXE_ARGS[i], arg
+            else:
+                raise ValueError('Too many arguments for exe')
+            if key not in EXE_ARGS:
+                raise ValueError('Unknown exe argument: {}'.format(key))
+            kwargs[key] = int(value)
+        setup = logic.calculate_exe_setup(**kwargs)
+        if setup is None:
+            raise ValueError('Base tech is too low!')
+        return {'setup': setup.as_dict()}
+    if command == 'kit':
+        if not args:
+            raise ValueError('No kit given')
+        kit, tech, modules = args[0], 16, {}
+        for arg in args[1:]:
+            if '=' not in arg:
+                raise ValueError('Expected <module>=<amount>, got: {}'.format(arg))
+            key, value = arg.rsplit('=', 1)
+            if key == 'tech':
+                tech = int(value)
+            else:
+                modules[key] = int(value)
+        return {'setup': logic.calculate_kit_setup(kit, tech, modules).as_dict()}
+    raise ValueError('Unknown command: {}'.format(command))
+
+
+def run_jobs(logic, lines, out):
+    """
+    Performs all given jobs and streams their results as lines of JSON.
+
+    Args:
+        logic (BppLogic): Logic module to calculate with.
+        lines (iterable): Job descriptions.
+        out (file): File to write results to.
+
+    Returns:
+        int: Number of failed jobs.
+    """
+    failed = 0
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            result = run_job(logic, line)
+        except Exception as e:
+            # Report failure of this job and carry on with the next (str of a KeyError quotes its message)
+            if isinstance(e, (KeyError, ValueError)):
+                message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+            else:
+                message = '{}: {}'.format(type(e).__name__, e)
+            result = {'error': message}
+            failed += 1
+        result['job'] = line
+        out.write(dumps(result) + '\n')
+    return failed
+
+
+def main(argv=None):
+    """
+    Command line entry point.
+
+    Args:
+        argv (list, optional): Command line arguments (defaults to those of the process).
+
+    Returns:
+        int: Exit code, 1 if any job failed.
+    """
+    parser = ArgumentParser(prog='python -m bpp_cli', description='Calculate BPP+ jobs without GUI.')
+    parser.add_argument('jobs', nargs='?', type=FileType('r'), default=sys.stdin,
+                        help='File with one job per line (default: stdin).')
+    parser.add_argument('--db', default=None, help='Database (.db) or dump file to use (default: bpp.db).')
+    parser.add_argument('--sweep', metavar='FILE', default=None,
+                        help='Write a table of ExE requirements (CSV, or Parquet for .parquet) instead of running jobs.')
+    parser.add_argument('--stats', metavar='FILE', default=None,
+                        help='Collect timings of queries and calculations and write them to a JSON file.')
+    parser.add_argument('--max-slots', type=int, default=30, help='Highest number of slots in the sweep (default: 30).')
+    args = parser.parse_args(argv)
+
+    if args.stats:
+        BppLogic.set_instrumentation(True)
+    # Keep stdout clean for results, initialisation messages go to stderr
+    with redirect_stdout(sys.stderr):
+        logic = BppLogic(args.db)
+    try:
+        if args.sweep:
+            rows = logic.export_exe_sweep(args.sweep, max_slots=args.max_slots)
+            print('Wrote {} rows to {}'.format(rows, args.sweep), file=sys.stderr)
+            return 0
+        failed = run_jobs(logic, args.jobs, sys.stdout)
+    finally:
+        with redirect_stdout(sys.stderr):
+            logic.stop()
+        if args.stats:
+            logic.export_statistics(args.stats)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
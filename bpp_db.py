@@ -1,4 +1,244 @@
-from sqlite3 import connect, Error
+# Project stuff
+from bpp_stats import stats
+
+# Standard library stuff
+from sqlite3 import connect, Connection, Cursor, Error
+from hashlib import sha256
+from threading import Lock, local
+from time import perf_counter
+
+# Settings of every connection: write-ahead logging lets readers continue while another connection writes
+# (and only needs syncing at checkpoints with synchronous NORMAL), a 16 MB page cache and memory mapped reads.
+PRAGMAS = (('journal_mode', 'WAL'),
+           ('synchronous', 'NORMAL'),
+           ('cache_size', -16000),
+           ('mmap_size', 256 * 1024 * 1024))
+
+# Normalised materials of every blueprint, one row per material per phase ('init' or 'per').
+# Blueprints are referenced by their rowid; the table is derived from the list columns of the blueprints table.
+MATERIALS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blueprint_materials (
+    blueprint_id INTEGER NOT NULL,
+    phase TEXT NOT NULL,
+    material TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    discount INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_blueprint_materials_blueprint ON blueprint_materials (blueprint_id, phase);
+CREATE INDEX IF NOT EXISTS idx_blueprint_materials_material ON blueprint_materials (material);
+CREATE INDEX IF NOT EXISTS idx_blueprints_blueprint ON blueprints (blueprint);
+"""
+
+# Indexes supporting the filters of the blueprint browser (names are indexed by MATERIALS_SCHEMA)
+BROWSE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_blueprints_tech ON blueprints (tech);
+CREATE INDEX IF NOT EXISTS idx_blueprints_source ON blueprints (source);
+"""
+# Blueprints added or changed locally, which database patches leave untouched
+CUSTOM_SCHEMA = "CREATE TABLE IF NOT EXISTS bpp_custom (blueprint TEXT PRIMARY KEY)"
+MARK_CUSTOM = "INSERT OR IGNORE INTO bpp_custom (blueprint) VALUES (?)"
+
+# Hash of the dump a database was initialised from, which is not part of any dump itself
+ORIGIN_SCHEMA = "CREATE TABLE IF NOT EXISTS bpp_origin (dump_hash TEXT)"
+ORIGIN_DUMP = ('CREATE TABLE bpp_origin ', 'INSERT INTO "bpp_origin" ')
+
+# Columns shown by the blueprint browser
+BROWSE_COLUMNS = ('id', 'blueprint', 'tech', 'source', 'manhours', 'products')
+
+# Stats of the modules (extractors, factories etc.) that can be equipped on every type of kit, one row per commodity
+# a module extracts, produces or converts. Rates are per day; extractor rates depend on their tech level.
+KIT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kit_modules (
+    kit TEXT NOT NULL,
+    role TEXT NOT NULL,
+    commodity TEXT NOT NULL,
+    name TEXT NOT NULL,
+    tech INTEGER NOT NULL DEFAULT 0,
+    rate REAL NOT NULL,
+    workers_to_equip INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_kit_modules_kit ON kit_modules (kit);
+"""
+KIT_COLUMNS = ('kit', 'role', 'commodity', 'name', 'tech', 'rate', 'workers_to_equip')
+# Initial contents of the kit_modules table, for databases from before its introduction
+DEFAULT_KIT_MODULES = \
+    [('exe', 'extractor', commod, 'Fusion Extractor', tech, rate, 1)
+     for commod, rates in (('metals', (21600, 28080, 34560, 43200, 51840)),
+                           ('nuclear waste', (6480, 8424, 10386, 12960, 15552)),
+                           ('silicon', (21600, 28080, 34560, 43200, 51840)),
+                           ('space oats', (21600, 28080, 34560, 43200, 51840)),
+                           ('baobabs', (21600, 28080, 34560, 43200, 51840)))
+     for tech, rate in zip((12, 14, 16, 18, 20), rates)] + \
+    [(kit, 'factory', commod, name, 0, rate * 24 * 60, workers)
+     for kit in ('exe', 'prod')
+     for commod, name, rate, workers in (('metals', 'Steel Foundry', 1000, 100),
+                                         ('nuclear waste', 'Star Bottling Plant', 300, 100),
+                                         ('silicon', 'Sentient Machine Learning Institute', 500, 50),
+                                         ('space oats', 'Giant Space Still', 350, 100),
+                                         ('baobabs', 'Figurine Workshop', 250, 100))] + \
+    [('colony', 'producer', 'space oats', 'Hydroponics', 0, 360 * 24, 1),
+     ('colony', 'producer', 'rations', 'MRE Factory', 0, 300 * 24, 1),
+     ('colony', 'factory', 'space oats', 'MRE Factory', 0, 600 * 24, 0),
+     ('colony', 'factory', 'credits', 'MRE Factory', 0, 5 * 5 * 24 * 60, 0)]
+
+# Columns of the blueprints table, in order of insertion
+BLUEPRINT_COLUMNS = ('blueprint', 'tech', 'source', 'bp_cost', 'weight', 'size',
+                     'max_uses', 'manhours', 'max_workforce',
+                     'init_credits', 'init_materials', 'init_materials_n', 'init_materials_discount',
+                     'per_credits', 'per_materials', 'per_materials_n', 'per_materials_discount',
+                     'products', 'products_n')
+INSERT_BLUEPRINT = "INSERT INTO blueprints({}) VALUES({})".format(', '.join(BLUEPRINT_COLUMNS),
+                                                                   ','.join('?' * len(BLUEPRINT_COLUMNS)))
+INSERT_MATERIAL = "INSERT INTO blueprint_materials (blueprint_id, phase, material, n, discount) VALUES (?,?,?,?,?)"
+
+
+def file_hash(file_name):
+    """
+    Calculates the SHA-256 hash of a file, to recognise whether it has changed.
+
+    Args:
+        file_name (str): Location of the file to hash.
+
+    Returns:
+        str: Hexadecimal hash of the file contents.
+    """
+    h = sha256()
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def parse_list(value):
+    """
+    Splits a (bracketed) list as stored in the database into its separate elements.
+
+    Args:
+        value (str): Either a single element or multiple elements formatted as '[a, b]'.
+
+    Returns:
+        list: Stripped elements as strings (empty if there are none).
+    """
+    if value is None or value == '':
+        return []
+    value = str(value)
+    if value[0] == '[':
+        # Starts with bracket, so multiple elements. Remove brackets, split and remove spaces.
+        return [v.strip() for v in value[1:-1].split(',')]
+    # Single element
+    return [value.strip()]
+
+
+def parse_flag(value):
+    """
+    Interprets a stored discount flag.
+
+    Args:
+        value (str): Flag as stored in the database (e.g. 'True', '0', 'yes').
+
+    Returns:
+        int: 1 if set, 0 if not set or None if unknown.
+    """
+    value = value.strip().lower()
+    if value in ('1', 'true', 'yes', 'y'):
+        return 1
+    if value in ('0', 'false', 'no', 'n'):
+        return 0
+    return None
+
+
+def material_rows(blueprint_id, bp):
+    """
+    Converts the list columns of a blueprint into rows of the blueprint_materials table.
+
+    Args:
+        blueprint_id (int): Rowid of the blueprint.
+        bp (dict): Blueprint columns, at least (init|per)_materials, (init|per)_materials_n
+            and (init|per)_materials_discount.
+
+    Returns:
+        list: Tuples of (blueprint_id, phase, material, n, discount).
+    """
+    rows = []
+    for phase in ('init', 'per'):
+        materials = parse_list(bp.get(phase + '_materials'))
+        amounts = parse_list(bp.get(phase + '_materials_n'))
+        discounts = [parse_flag(d) for d in parse_list(bp.get(phase + '_materials_discount'))]
+        # A single flag applies to all materials of the phase
+        if len(discounts) == 1:
+            discounts *= len(materials)
+        for i, mat in enumerate(materials):
+            rows.append((blueprint_id, phase, mat, int(amounts[i]), discounts[i] if i < len(discounts) else None))
+    return rows
+
+
+def query_name(sql):
+    """
+    Args:
+        sql (str): SQL statement.
+
+    Returns:
+        str: Statement on a single line, shortened to 80 characters (to group timings of the same query).
+    """
+    name = ' '.join(sql.split())
+    return name if len(name) <= 80 else name[:77] + '...'
+
+
+class TimedCursor(Cursor):
+    """ Cursor recording duration and row count of its queries while instrumentation is enabled. """
+    event = None
+
+    def execute(self, sql, parameters=()):
+        if not stats.enabled:
+            self.event = None
+            return super().execute(sql, parameters)
+        start = perf_counter()
+        super().execute(sql, parameters)
+        # Row count is only known for changes here, selected rows are counted while fetching
+        self.event = stats.record('query', query_name(sql), perf_counter() - start,
+                                  self.rowcount if self.rowcount >= 0 else None)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        if not stats.enabled:
+            self.event = None
+            return super().executemany(sql, seq_of_parameters)
+        start = perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self.event = stats.record('query', query_name(sql), perf_counter() - start,
+                                  self.rowcount if self.rowcount >= 0 else None)
+        return self
+
+    def fetchone(self):
+        if self.event is None:
+            return super().fetchone()
+        start = perf_counter()
+        row = super().fetchone()
+        self.event[3] += perf_counter() - start
+        self.event[4] = (self.event[4] or 0) + (row is not None)
+        return row
+
+    def fetchall(self):
+        if self.event is None:
+            return super().fetchall()
+        start = perf_counter()
+        rows = super().fetchall()
+        self.event[3] += perf_counter() - start
+        self.event[4] = (self.event[4] or 0) + len(rows)
+        return rows
+
+
+class TimedConnection(Connection):
+    """ Connection creating timed cursors, also for its shortcut execute methods. """
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
 
 
 class BppDb:
@@ -14,16 +254,50 @@ class BppDb:
             db_file (str): Name (and location) of the database file
         """
         self.db_file = db_file
-        self.connection = None
+        # Every thread gets its own connection (SQLite connections cannot be shared between threads)
+        self.local = local()
+        self.pool = []
+        self.pool_lock = Lock()
+        self.is_open = False
 
     def create_connection(self):
-        """Try to connect to existing SQLite database."""
+        """Try to connect to existing SQLite database. Other threads connect on first use of the connection."""
+        self.is_open = True
         try:
-            self.connection = connect(self.db_file)
+            self.local.connection = self.open_connection()
         except Error as e:
+            self.is_open = False
             print(e)
             raise
 
+    def open_connection(self):
+        """
+        Opens a new connection with the pragmas of PRAGMAS and adds it to the pool.
+
+        Returns:
+            sqlite3.Connection: New connection to the database.
+        """
+        # Wait for a writer instead of failing immediately, connections are only used by the thread that opened them
+        connection = connect(self.db_file, timeout=10, check_same_thread=False, factory=TimedConnection)
+        for pragma, value in PRAGMAS:
+            connection.execute('PRAGMA {} = {}'.format(pragma, value))
+        with self.pool_lock:
+            self.pool.append(connection)
+        return connection
+
+    @property
+    def connection(self):
+        """
+        Returns:
+            sqlite3.Connection: Connection of the current thread (opened if needed), or None if the database is closed.
+        """
+        if not self.is_open:
+            return None
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = self.open_connection()
+        return connection
+
     def get_db_version(self):
         """Queries the version of the current database.
 
@@ -45,19 +319,21 @@ class BppDb:
         """
         self.connection.cursor().execute(create_table_sql)
 
-    def get_variable(self, variable):
+    def get_variable(self, variable, default=None):
         """ Retrieves value of a BPP+ specific variable.
 
         Args:
             variable (str): Name of variable to look for.
+            default (str, optional): Value to return if the variable does not exist.
 
         Returns:
             str: Value of requested variable.
         """
         cur = self.connection.cursor()
-        cur.execute(f"SELECT value FROM bpp_variables WHERE variable = '{variable}'")
+        cur.execute("SELECT value FROM bpp_variables WHERE variable = ?", (variable,))
+        row = cur.fetchone()
 
-        return cur.fetchone()[0]
+        return row[0] if row is not None else default
 
     def replace_variable(self, variable, value):
         """Replace (add or change) BPP+ specific variable in table of variables.
@@ -69,6 +345,7 @@ class BppDb:
         sql = "REPLACE INTO bpp_variables (variable, value) VALUES ('{}', '{}')".\
             format(variable, value)
         self.connection.cursor().execute(sql)
+        self.connection.commit()
 
     def insert_blueprint(self, bp, products, **kwargs):
         """
@@ -97,41 +374,46 @@ class BppDb:
                 products_n (str, optional): Number produced of each product.
 
         Returns:
+            int: Id (rowid) of the new blueprint.
         """
-        # Construct sql statement and corresponding values
-        sql = """INSERT INTO blueprints(blueprint, tech, source, bp_cost, weight, size,
-                                        max_uses, manhours, max_workforce,
-                                        init_credits, init_materials, init_materials_n, init_materials_discount,
-                                        per_credits, per_materials, per_materials_n, per_materials_discount,
-                                        products, products_n)
-                  VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"""
-        values = (bp,
-                  kwargs['tech'] if 'tech' in kwargs.keys() else None,
-                  kwargs['source'] if 'source' in kwargs.keys() else None,
-                  kwargs['bp_cost'] if 'bp_cost' in kwargs.keys() else None,
-                  kwargs['weight'] if 'weight' in kwargs.keys() else None,
-                  kwargs['size'] if 'size' in kwargs.keys() else None,
-                  kwargs['max_uses'] if 'max_uses' in kwargs.keys() else None,
-                  kwargs['manhours'] if 'manhours' in kwargs.keys() else None,
-                  kwargs['max_workforce'] if 'max_workforce' in kwargs.keys() else None,
-                  kwargs['init_credits'] if 'init_credits' in kwargs.keys() else None,
-                  kwargs['init_materials'] if 'init_materials' in kwargs.keys() else None,
-                  kwargs['init_materials_n'] if 'init_materials_n' in kwargs.keys() else None,
-                  kwargs['init_materials_discount'] if 'init_materials_discount' in kwargs.keys() else None,
-                  kwargs['per_credits'] if 'per_credits' in kwargs.keys() else None,
-                  kwargs['per_materials'] if 'per_materials' in kwargs.keys() else None,
-                  kwargs['per_materials_n'] if 'per_materials_n' in kwargs.keys() else None,
-                  kwargs['per_materials_discount'] if 'per_materials_discount' in kwargs.keys() else None,
-                  products,
-                  kwargs['products_n'] if 'products_n' in kwargs.keys() else None)
-
-        # Execute and commit insert
+        # Execute and commit insert, including the normalised materials
         if self.connection is not None:
-            self.connection.cursor().execute(sql, values)
+            values = dict(kwargs, blueprint=bp, products=products)
+            cur = self.connection.cursor()
+            cur.execute(INSERT_BLUEPRINT, tuple(values.get(col) for col in BLUEPRINT_COLUMNS))
+            bp_id = cur.lastrowid
+            cur.executemany(INSERT_MATERIAL, material_rows(bp_id, kwargs))
+            cur.execute(MARK_CUSTOM, (bp,))
             self.connection.commit()
+            return bp_id
         else:
             raise FileNotFoundError("Error! No database connection.")
 
+    def insert_blueprints(self, records):
+        """
+        Add many (new) blueprints to the blueprints table in a single transaction.
+
+        Args:
+            records (list): Dictionaries with column names (at least 'blueprint' and 'products') and values.
+
+        Returns:
+            int: Number of blueprints inserted.
+        """
+        if self.connection is None:
+            raise FileNotFoundError("Error! No database connection.")
+
+        with self.connection:   # Commits at the end, or rolls back entirely on failure
+            cur = self.connection.cursor()
+            materials = []
+            for rec in records:
+                cur.execute(INSERT_BLUEPRINT, tuple(rec.get(col) for col in BLUEPRINT_COLUMNS))
+                # Rowid of this very insert, other connections may write between transactions
+                materials.extend(material_rows(cur.lastrowid, rec))
+            cur.executemany(INSERT_MATERIAL, materials)
+            cur.executemany(MARK_CUSTOM, ((rec['blueprint'],) for rec in records))
+
+        return len(records)
+
     def initialise_database(self, dump_file):
         """
         Initialise database based on an exported SQLite database.
@@ -145,34 +427,277 @@ class BppDb:
             # Read from given dump file
             with open(dump_file, 'r') as df:
                 self.connection.cursor().executescript(df.read())
+            # Rowids are not preserved in a dump, so always derive the materials table anew
+            self.migrate_materials(rebuild=True)
         else:
             raise FileNotFoundError("Error! No database connection.")
 
-    def get_all_blueprints(self):
-        """ Query all blueprints from the blueprints table.
+    def migrate_materials(self, rebuild=False):
+        """
+        Creates and fills the normalised blueprint_materials table from the list columns of the blueprints table.
+
+        Args:
+            rebuild (bool): Whether to fill the table anew if it already exists.
+        """
+        cur = self.connection.cursor()
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'blueprint_materials'")
+        if cur.fetchone() and not rebuild:
+            # Already migrated
+            return
+
+        cur.executescript(MATERIALS_SCHEMA)
+        cur.execute("DELETE FROM blueprint_materials")
+        cur.execute("""SELECT rowid, init_materials, init_materials_n, init_materials_discount,
+                              per_materials, per_materials_n, per_materials_discount FROM blueprints""")
+        columns = [desc[0] for desc in cur.description]
+        rows = []
+        for bp in cur.fetchall():
+            rows.extend(material_rows(bp[0], dict(zip(columns, bp))))
+        cur.executemany(INSERT_MATERIAL, rows)
+        self.connection.commit()
+
+    def migrate_kit_modules(self):
+        """ Creates the kit_modules table and fills it with the default modules if it is still empty. """
+        cur = self.connection.cursor()
+        cur.executescript(KIT_SCHEMA)
+        cur.execute("SELECT 1 FROM kit_modules LIMIT 1")
+        if cur.fetchone():
+            # Already migrated
+            return
+
+        cur.executemany("INSERT INTO kit_modules ({}) VALUES ({})".format(', '.join(KIT_COLUMNS),
+                                                                         ','.join('?' * len(KIT_COLUMNS))),
+                        DEFAULT_KIT_MODULES)
+        self.connection.commit()
+
+    def get_kit_modules(self):
+        """ Query the stats of all kit modules, in order of insertion.
+
+        Returns:
+            list: Dictionaries with kit, role, commodity, name, tech, rate and workers_to_equip.
+        """
+        cur = self.connection.cursor()
+        cur.execute("SELECT {} FROM kit_modules ORDER BY rowid".format(', '.join(KIT_COLUMNS)))
+
+        return [dict(zip(KIT_COLUMNS, row)) for row in cur.fetchall()]
+
+    def migrate_custom(self):
+        """ Creates the table of local customisations, if it does not exist yet. """
+        self.connection.execute(CUSTOM_SCHEMA)
+        self.connection.commit()
+
+    def apply_patches(self, patches):
+        """
+        Applies database patches in a single transaction (either all changes are made or none).
+        Blueprints customised locally (see bpp_custom) are kept as they are, as is the customisation suffix
+        of the database version. Patches up to the one applying to the current version are skipped
+        (e.g. when replayed on a newer database), every further patch must continue where the previous one ends.
+
+        Args:
+            patches (list): Patches in order of application (see bpp_patch), with validated blueprints.
+
+        Returns:
+            dict: Number of blueprints added, changed, removed and kept (customised), of variables changed
+                and of patches skipped.
+
+        Raises:
+            ValueError: If the patches do not form a chain from the current version (nothing is changed).
+        """
+        if self.connection is None:
+            raise FileNotFoundError("Error! No database connection.")
+
+        result = dict.fromkeys(('added', 'changed', 'removed', 'kept', 'variables', 'skipped'), 0)
+        version = self.get_db_version()
+        customised = version.endswith('c')
+        if customised:
+            version = version[:-1]
+        # Skip patches until the one applying to the current version
+        start = next((i for i, patch in enumerate(patches) if str(patch['from']) == version), len(patches))
+        result['skipped'] = start
+        patches = patches[start:]
+        if not patches:
+            return result
+
+        with self.connection:   # Commits at the end, or rolls back entirely on failure
+            cur = self.connection.cursor()
+            cur.execute("SELECT blueprint FROM bpp_custom")
+            custom = {row[0] for row in cur.fetchall()}
+            for patch in patches:
+                if str(patch['from']) != version:
+                    raise ValueError('Patch from {} to {} does not apply to version {}'.format(
+                        patch['from'], patch['to'], version))
+                blueprints = patch.get('blueprints', {})
+                for name in blueprints.get('removed', []):
+                    if name in custom:
+                        result['kept'] += 1
+                        continue
+                    cur.execute("DELETE FROM blueprint_materials WHERE blueprint_id IN "
+                                "(SELECT rowid FROM blueprints WHERE blueprint = ?)", (name,))
+                    cur.execute("DELETE FROM blueprints WHERE blueprint = ?", (name,))
+                    result['removed'] += cur.rowcount > 0
+
+                for bp in blueprints.get('added', []) + blueprints.get('changed', []):
+                    if bp['blueprint'] in custom:
+                        result['kept'] += 1
+                        continue
+                    cur.execute("SELECT rowid FROM blueprints WHERE blueprint = ?", (bp['blueprint'],))
+                    ids = [row[0] for row in cur.fetchall()]
+                    if ids:
+                        # Update in place, so the blueprint keeps its id
+                        cur.executemany("UPDATE blueprints SET {} WHERE rowid = ?".format(
+                            ', '.join(col + ' = ?' for col in BLUEPRINT_COLUMNS)),
+                            (tuple(bp.get(col) for col in BLUEPRINT_COLUMNS) + (bp_id,) for bp_id in ids))
+                        cur.executemany("DELETE FROM blueprint_materials WHERE blueprint_id = ?",
+                                        ((bp_id,) for bp_id in ids))
+                        result['changed'] += 1
+                    else:
+                        cur.execute(INSERT_BLUEPRINT, tuple(bp.get(col) for col in BLUEPRINT_COLUMNS))
+                        ids = [cur.lastrowid]
+                        result['added'] += 1
+                    cur.executemany(INSERT_MATERIAL, (row for bp_id in ids for row in material_rows(bp_id, bp)))
+
+                variables = patch.get('variables', {})
+                for variable, value in variables.get('set', {}).items():
+                    if variable != 'db_version':
+                        cur.execute("INSERT OR REPLACE INTO bpp_variables (variable, value) VALUES (?, ?)",
+                                    (variable, value))
+                        result['variables'] += 1
+                for variable in variables.get('removed', []):
+                    if variable != 'db_version':
+                        cur.execute("DELETE FROM bpp_variables WHERE variable = ?", (variable,))
+                        result['variables'] += 1
+                version = str(patch['to'])
+
+            # Keep marking the database as customised
+            cur.execute("INSERT OR REPLACE INTO bpp_variables (variable, value) VALUES ('db_version', ?)",
+                        (version + 'c' if customised else version,))
+
+        return result
+
+    def migrate_indexes(self):
+        """ Creates the indexes of the blueprint browser, if they do not exist yet. """
+        self.connection.executescript(BROWSE_INDEXES)
+
+    @staticmethod
+    def filter_clause(tech_min=None, tech_max=None, source=None, material=None, text=None):
+        """
+        Translates blueprint filters into a parameterised WHERE clause. Filters that are None are not applied.
+
+        Args:
+            tech_min (int, optional): Lowest tech level.
+            tech_max (int, optional): Highest tech level.
+            source (str, optional): Exact source of the blueprint.
+            material (str, optional): Material (or component) required by the blueprint.
+            text (str, optional): Text the blueprint name contains (case insensitive).
+
+        Returns:
+            tuple: (WHERE clause (empty if there are no filters), list of parameters)
+        """
+        conditions = []
+        params = []
+        if tech_min is not None:
+            conditions.append("tech >= ?")
+            params.append(tech_min)
+        if tech_max is not None:
+            conditions.append("tech <= ?")
+            params.append(tech_max)
+        if source is not None:
+            conditions.append("source = ?")
+            params.append(source)
+        if material is not None:
+            conditions.append("rowid IN (SELECT blueprint_id FROM blueprint_materials WHERE material = ?)")
+            params.append(material)
+        if text:
+            # Escape wildcards, the text is matched literally
+            conditions.append("blueprint LIKE ? ESCAPE '\\'")
+            params.append('%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def get_blueprint_page(self, filters=None, after=None, limit=100):
+        """
+        Query one page of blueprints matching filters, ordered by name.
+        Pages continue after the last row of the previous page (keyset pagination), so later pages are as
+        cheap as the first.
+
+        Args:
+            filters (dict, optional): Filters as keyword arguments of filter_clause.
+            after (tuple, optional): (name, id) of the last blueprint of the previous page.
+            limit (int): Maximum number of blueprints on the page.
+
+        Returns:
+            list: Rows of BROWSE_COLUMNS.
+        """
+        where, params = self.filter_clause(**(filters or {}))
+        if after is not None:
+            where += (" AND " if where else " WHERE ") + "(blueprint, rowid) > (?, ?)"
+            params += list(after)
+        cur = self.connection.cursor()
+        cur.execute("SELECT rowid AS {} FROM blueprints{} ORDER BY blueprint, rowid LIMIT ?"
+                    .format(', '.join(BROWSE_COLUMNS), where), params + [limit])
+
+        return cur.fetchall()
+
+    def count_blueprints(self, filters=None):
+        """
+        Count the blueprints matching filters.
+
+        Args:
+            filters (dict, optional): Filters as keyword arguments of filter_clause.
+
+        Returns:
+            int: Number of matching blueprints.
+        """
+        where, params = self.filter_clause(**(filters or {}))
+        cur = self.connection.cursor()
+        cur.execute("SELECT COUNT(*) FROM blueprints" + where, params)
+
+        return cur.fetchone()[0]
+
+    def get_sources(self):
+        """ Query all distinct sources of blueprints.
 
         Returns:
-            A list of all blueprints in the database.
+            list: Sources, sorted.
         """
         cur = self.connection.cursor()
-        cur.execute("SELECT DISTINCT blueprint FROM blueprints")
+        cur.execute("SELECT DISTINCT source FROM blueprints WHERE source IS NOT NULL ORDER BY source")
 
         return [row[0] for row in cur.fetchall()]
 
-    def find_blueprint(self, bp_name):
-        """ Retrieves all information about a specified blueprint.
+    def get_blueprint_rows(self, bp_id=None):
+        """ Query all columns of all blueprints, including their rowid as 'id'.
+
+        Args:
+            bp_id (int, optional): Only query the blueprint with this id.
+
+        Returns:
+            tuple: (list of column names, list of row tuples)
+        """
+        cur = self.connection.cursor()
+        if bp_id is None:
+            cur.execute("SELECT rowid AS id, * FROM blueprints ORDER BY rowid")
+        else:
+            cur.execute("SELECT rowid AS id, * FROM blueprints WHERE rowid = ?", (bp_id,))
+
+        return [desc[0] for desc in cur.description], cur.fetchall()
+
+    def get_all_materials(self, bp_id=None):
+        """ Query the normalised materials of all blueprints.
 
         Args:
-            bp_name (str): Name of the blueprint to find.
+            bp_id (int, optional): Only query the materials of the blueprint with this id.
+
         Returns:
-            Complete results found for specified blueprint name.
+            list: Tuples of (blueprint_id, phase, material, n, discount) in order of insertion.
         """
         cur = self.connection.cursor()
-        cur.execute("SELECT * FROM blueprints WHERE blueprint = '" + bp_name + "'")
-        # TODO handle situations with 0 or >1 results
+        if bp_id is None:
+            cur.execute("SELECT blueprint_id, phase, material, n, discount FROM blueprint_materials ORDER BY rowid")
+        else:
+            cur.execute("SELECT blueprint_id, phase, material, n, discount FROM blueprint_materials "
+                        "WHERE blueprint_id = ? ORDER BY rowid", (bp_id,))
 
-        # Returns dictionary with column names as keys and corresponding values
-        return dict(zip([desc[0] for desc in cur.description], cur.fetchone()))
+        return cur.fetchall()
 
     def dump(self, dump_file):
         """
@@ -183,9 +708,90 @@ class BppDb:
         """
         with open(dump_file, 'w') as df:
             for line in self.connection.iterdump():
-                df.write(line + '\n')
+                if not line.startswith(ORIGIN_DUMP):
+                    df.write(line + '\n')
+
+    @staticmethod
+    def read_snapshot_key(snapshot_file):
+        """
+        Reads which dump a binary snapshot was created from.
+
+        Args:
+            snapshot_file (str): Location of the snapshot (an SQLite database file).
+
+        Returns:
+            tuple: (dump hash, database version) of the snapshot, or None if it is missing or unreadable.
+        """
+        try:
+            con = connect('file:{}?mode=ro'.format(snapshot_file), uri=True)
+        except Error:
+            return None
+        try:
+            key = con.execute("SELECT dump_hash, db_version FROM bpp_snapshot").fetchone()
+            version = con.execute("SELECT value FROM bpp_variables WHERE variable = 'db_version'").fetchone()
+        except Error:
+            return None
+        finally:
+            con.close()
+        # The stored version must match the snapshot contents, otherwise it cannot be trusted
+        if key is None or version is None or key[1] != version[0]:
+            return None
+        return key
+
+    def save_snapshot(self, snapshot_file, dump_hash):
+        """
+        Stores a binary copy of the database, keyed by the dump it corresponds to.
+
+        Args:
+            snapshot_file (str): Location to store the snapshot at.
+            dump_hash (str): Hash of the dump file the database corresponds to.
+        """
+        snapshot = connect(snapshot_file)
+        try:
+            self.connection.backup(snapshot)
+            # Snapshots are opened read-only, which requires a rollback journal instead of WAL
+            snapshot.execute("PRAGMA journal_mode = DELETE")
+            snapshot.execute("DROP TABLE IF EXISTS bpp_snapshot")
+            snapshot.execute("CREATE TABLE bpp_snapshot (dump_hash TEXT, db_version TEXT)")
+            snapshot.execute("INSERT INTO bpp_snapshot (dump_hash, db_version) VALUES (?, ?)",
+                             (dump_hash, self.get_db_version()))
+            snapshot.commit()
+        finally:
+            snapshot.close()
+
+    def set_origin(self, dump_hash):
+        """
+        Records which dump the database was initialised from (or last written to).
+
+        Args:
+            dump_hash (str): Hash of the dump file.
+        """
+        with self.connection:
+            self.connection.execute(ORIGIN_SCHEMA)
+            self.connection.execute("DELETE FROM bpp_origin")
+            self.connection.execute("INSERT INTO bpp_origin (dump_hash) VALUES (?)", (dump_hash,))
+
+    def get_origin(self):
+        """
+        Returns:
+            str: Hash of the dump the database was initialised from, or None if unknown.
+        """
+        try:
+            row = self.connection.execute("SELECT dump_hash FROM bpp_origin").fetchone()
+        except Error:
+            return None
+        return row[0] if row is not None else None
+
+    def drop_snapshot_key(self):
+        """ Removes the snapshot key from a database that was copied from a snapshot. """
+        self.connection.execute("DROP TABLE IF EXISTS bpp_snapshot")
+        self.connection.commit()
 
     def close_connection(self):
-        """ Close connection to current SQLite database. """
-        if self.connection:
-            self.connection.close()
+        """ Close all connections to current SQLite database (of all threads). """
+        self.is_open = False
+        with self.pool_lock:
+            for connection in self.pool:
+                connection.close()
+            self.pool = []
+        self.local = local()
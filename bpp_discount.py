@@ -0,0 +1,169 @@
+class BulkDiscount:
+    """
+    Bulk discount curve: building n (> 1) at once requires n ** exponent times the materials of a single build,
+    for materials flagged as discounted. Values are cached, so repeatedly evaluating the same amounts is cheap.
+    """
+    MAX_CACHED = 4096   # Curve values kept, the cache is emptied when full
+
+    def __init__(self, exponent=1.0):
+        """
+        Args:
+            exponent (float): Exponent of the curve, 1 means no discount.
+        """
+        self.exponent = exponent
+        self.curve = {}
+
+    def __call__(self, builds):
+        """
+        Args:
+            builds (float): Number of builds.
+
+        Returns:
+            float: Multiplier to apply to the materials of a single build.
+        """
+        if builds not in self.curve:
+            if len(self.curve) >= self.MAX_CACHED:
+                self.curve.clear()
+            # Partial builds (of sub-blueprints) receive no discount
+            self.curve[builds] = builds ** self.exponent if self.exponent != 1 and builds > 1 else builds
+        return self.curve[builds]
+
+
+def compile_plan(catalog, bp_name, plans):
+    """
+    Compiles the recipe tree of a blueprint into a plan that can be evaluated for any amount without further lookups.
+    Plans of sub-blueprints are shared, so every blueprint is only compiled once. Sub-blueprints are compiled first,
+    from an explicit stack, so recipe chains of any depth can be compiled.
+
+    Args:
+        catalog (BlueprintCatalog): Catalog of all blueprints.
+        bp_name (str): Name of the blueprint to compile.
+        plans (dict): Already compiled plans by blueprint name (extended in place).
+
+    Returns:
+        tuple: Entries of (material, amount per build, discounted, plan of sub-blueprint or None, produced per build).
+
+    Raises:
+        ValueError: If the blueprint (indirectly) requires its own product.
+    """
+    producers = catalog.get_producers()
+    stack = [bp_name]
+    compiling = set()   # Blueprints waiting for their sub-blueprints, to detect cycles
+    while stack:
+        name = stack[-1]
+        if name in plans:
+            # Also required by another blueprint compiled in the meantime
+            stack.pop()
+            continue
+        bp = catalog.get(name)
+        if name not in compiling:
+            # Compile sub-blueprints first
+            compiling.add(name)
+            for materials in (bp.init, bp.per):
+                for mat, _, _ in materials:
+                    sub_bp = producers[mat][0] if mat in producers else None
+                    if sub_bp is None or sub_bp in plans:
+                        continue
+                    if sub_bp in compiling:
+                        raise ValueError('Cyclic recipe detected for blueprint {}!'.format(sub_bp))
+                    stack.append(sub_bp)
+            continue
+
+        # All sub-blueprints are compiled
+        entries = []
+        for materials, credits in ((bp.init, bp.init_credits), (bp.per, bp.per_credits)):
+            for mat, n, discount in materials:
+                if mat in producers:
+                    sub_bp, produced = producers[mat]
+                    entries.append((mat, n, bool(discount), plans[sub_bp], produced))
+                else:
+                    entries.append((mat, n, bool(discount), None, 1))
+            # Credits are never discounted
+            if credits:
+                entries.append(('Credits', int(credits), False, None, 1))
+        plans[name] = tuple(entries)
+        compiling.discard(name)
+        stack.pop()
+
+    return plans[bp_name]
+
+
+def sub_builds(plan, builds, discount):
+    """
+    Determines how often every material of a compiled plan is required for a number of builds.
+
+    Args:
+        plan (tuple): Compiled plan (see compile_plan).
+        builds (float): Number of builds.
+        discount (BulkDiscount): Discount curve.
+
+    Yields:
+        tuple: (Material, plan of its sub-blueprint or None, amount of the material or builds of the sub-blueprint)
+    """
+    for mat, n, discounted, sub_plan, produced in plan:
+        amount = n * (discount(builds) if discounted else builds)
+        if sub_plan is None:
+            yield mat, None, amount
+        else:
+            yield mat, sub_plan, amount // produced if amount % produced == 0 else amount / produced
+
+
+def evaluate_plan(plan, builds, discount, vector, memo=None):
+    """
+    Adds the basic commodities required for a number of builds of a compiled plan to a vector.
+    Sub-blueprints are built in bulk as well, so the discount also applies to their materials.
+
+    Args:
+        plan (tuple): Compiled plan (see compile_plan).
+        builds (float): Number of builds.
+        discount (BulkDiscount): Discount curve.
+        vector (dict): Basic commodities to add to (modified in place).
+        memo (dict, optional): Costs of (sub-)plans by plan id and number of builds (extended in place).
+            Only valid for the same plans and discount curve, new for every evaluation if not given.
+    """
+    if memo is None:
+        memo = {}
+    for mat, amount in plan_cost(plan, builds, discount, memo).items():
+        vector[mat] = vector.get(mat, 0) + amount
+
+
+def plan_cost(plan, builds, discount, memo):
+    """
+    Determines the basic commodities required for a number of builds of a compiled plan.
+    The (sub-)plans required and their numbers of builds are found top-down from an explicit stack, and evaluated
+    in reverse order, so every plan is evaluated after its sub-plans and recipe trees of any depth can be evaluated.
+    Results are memoised per plan and number of builds, so sub-blueprints shared by several paths of the recipe tree
+    are only evaluated once.
+
+    Args:
+        plan (tuple): Compiled plan (see compile_plan).
+        builds (float): Number of builds.
+        discount (BulkDiscount): Discount curve.
+        memo (dict): Costs of (sub-)plans by plan id and number of builds (extended in place).
+
+    Returns:
+        dict: Basic commodities (and credits) required, should not be modified.
+    """
+    stack = [(plan, builds, False)]
+    while stack:
+        sub_plan, n, expanded = stack.pop()
+        key = (id(sub_plan), n)
+        if key in memo:
+            continue
+        if not expanded:
+            # Evaluate again once the sub-plans are
+            stack.append((sub_plan, n, True))
+            stack.extend((mat_plan, amount, False) for _, mat_plan, amount in sub_builds(sub_plan, n, discount)
+                         if mat_plan is not None and (id(mat_plan), amount) not in memo)
+            continue
+
+        vector = {}
+        for mat, mat_plan, amount in sub_builds(sub_plan, n, discount):
+            if mat_plan is None:
+                vector[mat] = vector.get(mat, 0) + amount
+            else:
+                for sub_mat, sub_amount in memo[(id(mat_plan), amount)].items():
+                    vector[sub_mat] = vector.get(sub_mat, 0) + sub_amount
+        memo[key] = vector
+
+    return memo[(id(plan), builds)]
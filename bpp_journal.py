@@ -0,0 +1,95 @@
+from json import dumps, loads
+from os.path import getsize, isfile
+
+
+class BppJournal:
+    """
+    Append-only journal of changes made to the database since its dump was written.
+    Every entry names a BppDb method and the arguments it was called with, so it can be replayed on top of the dump.
+    The first line holds the hash of the dump the changes were made on, so they are never replayed on another dump.
+    """
+
+    def __init__(self, journal_file):
+        """
+        Class is initialised with the location of the journal file (created when it is reset).
+
+        Args:
+            journal_file (str): Name (and location) of the journal file.
+        """
+        self.journal_file = journal_file
+
+    def reset(self, dump_hash):
+        """
+        Empties the journal, to record changes made on top of a dump.
+
+        Args:
+            dump_hash (str): Hash of the dump file (see bpp_db.file_hash).
+        """
+        with open(self.journal_file, 'w') as jf:
+            jf.write(dumps({'dump': dump_hash}) + '\n')
+
+    def dump_hash(self):
+        """
+        Returns:
+            str: Hash of the dump the journal belongs to, or None if there is no journal (or it has no header).
+        """
+        if not isfile(self.journal_file):
+            return None
+        with open(self.journal_file, 'r') as jf:
+            try:
+                header = loads(jf.readline())
+            except ValueError:
+                return None
+        return header.get('dump') if isinstance(header, dict) else None
+
+    def append(self, method, **kwargs):
+        """
+        Records one change at the end of the journal.
+
+        Args:
+            method (str): Name of the BppDb method that made the change (e.g. 'insert_blueprint').
+            **kwargs (any): Arguments the method was called with.
+        """
+        with open(self.journal_file, 'a') as jf:
+            jf.write(dumps({'method': method, 'args': kwargs}) + '\n')
+
+    def entries(self):
+        """
+        Reads all recorded changes, in order.
+
+        Returns:
+            list: Tuples of (method name, arguments dictionary).
+        """
+        if not isfile(self.journal_file):
+            return []
+        with open(self.journal_file, 'r') as jf:
+            entries = [loads(line) for line in jf if line.strip()]
+        return [(entry['method'], entry['args']) for entry in entries if 'method' in entry]
+
+    def replay(self, db, dump_hash):
+        """
+        Applies all recorded changes to a database, if they were made on the given dump.
+
+        Args:
+            db (BppDb): Database module to apply the changes to.
+            dump_hash (str): Hash of the dump the database was initialised from.
+
+        Returns:
+            int: Number of changes applied.
+
+        Raises:
+            ValueError: If the journal belongs to another dump.
+        """
+        if self.dump_hash() != dump_hash:
+            raise ValueError('Journal {} does not belong to this dump'.format(self.journal_file))
+        entries = self.entries()
+        for method, args in entries:
+            getattr(db, method)(**args)
+        return len(entries)
+
+    def size(self):
+        """
+        Returns:
+            int: Size of the journal file in bytes (0 if there is none).
+        """
+        return getsize(self.journal_file) if isfile(self.journal_file) else 0
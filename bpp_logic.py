@@ -1,9 +1,313 @@
 # Project stuff
-from bpp_db import BppDb
+from bpp_batch import plan_bodies, read_bodies
+from bpp_db import BppDb, BLUEPRINT_COLUMNS, BROWSE_COLUMNS, file_hash, parse_list
+from bpp_discount import BulkDiscount, compile_plan, evaluate_plan
+from bpp_journal import BppJournal
+from bpp_matrix import compile_cost_matrix
+from bpp_patch import patch_chain, read_patches
+from bpp_schedule import schedule_order
+from bpp_search import NameIndex
+from bpp_stats import instrumented, stats
 from kit_setup import KitSetup
 
 # OS stuff to work with files etc.
-from os.path import isfile
+from os import remove
+from os.path import abspath, isdir, isfile, splitext
+from shutil import copyfile
+from threading import Lock, RLock
+
+# Import formats
+from csv import DictReader
+from json import load
+
+# Standard location of the database dump
+DUMP_FILE = 'bpp_db.sql'
+# Standard location of the database, which dumps are read into
+DB_FILE = 'bpp.db'
+# Directory holding database patches (see bpp_patch)
+PATCH_DIR = 'patches'
+
+# Columns of the blueprints table holding numbers
+NUMERIC_COLUMNS = ('tech', 'bp_cost', 'weight', 'size', 'max_uses', 'manhours', 'max_workforce',
+                   'init_credits', 'per_credits')
+# Bulk builds of which the cost is kept, the cache is emptied when full
+MAX_BULK_COSTS = 1024
+
+
+def validate_blueprint(record):
+    """
+    Checks and normalises a blueprint record, for instance a row read from a CSV or JSON file.
+
+    Args:
+        record (dict): Column names and values. The name may be given as either 'name' or 'blueprint'.
+
+    Returns:
+        dict: Record with only known columns, numbers converted and empty values as None.
+
+    Raises:
+        ValueError: If the record is incomplete or inconsistent.
+    """
+    bp = {col: record.get(col) for col in BLUEPRINT_COLUMNS}
+    if bp['blueprint'] is None:
+        bp['blueprint'] = record.get('name')
+    # Treat empty strings (as read from CSV) as missing values
+    for col, value in bp.items():
+        if isinstance(value, str):
+            value = value.strip()
+            bp[col] = value if value else None
+
+    if not bp['blueprint']:
+        raise ValueError('Blueprint name is missing')
+    if not bp['products']:
+        raise ValueError('Products of {} are missing'.format(bp['blueprint']))
+    for col in NUMERIC_COLUMNS:
+        if bp[col] is not None:
+            try:
+                bp[col] = int(bp[col])
+            except ValueError:
+                raise ValueError('{} of {} is not a whole number: {}'.format(col, bp['blueprint'], bp[col])) from None
+    for col in ('init_materials', 'per_materials', 'products'):
+        items = parse_list(bp[col])
+        amounts = parse_list(bp[col + '_n'])
+        if col != 'products' and len(items) != len(amounts):
+            raise ValueError('{} of {} has {} material(s) but {} amount(s)'.format(
+                col, bp['blueprint'], len(items), len(amounts)))
+        if not all(n.isdigit() for n in amounts):
+            raise ValueError('{}_n of {} are not all whole numbers: {}'.format(col, bp['blueprint'], bp[col + '_n']))
+        # Costs are divided by the amounts produced, and materials of no amount make no sense
+        if any(int(n) == 0 for n in amounts):
+            raise ValueError('{}_n of {} contain a zero amount: {}'.format(col, bp['blueprint'], bp[col + '_n']))
+
+    return bp
+
+
+def read_blueprints(file_name):
+    """
+    Streams blueprint records from a CSV file (with a header of column names) or a JSON file (list of objects).
+
+    Args:
+        file_name (str): Location of the file to read.
+
+    Returns:
+        iterator: Dictionaries of column names and values.
+    """
+    with open(file_name, 'r', newline='') as f:
+        if splitext(file_name)[1].lower() == '.json':
+            yield from load(f)
+        else:
+            yield from DictReader(f)
+
+
+class Blueprint:
+    """
+    Compact in-memory record of a blueprint, with pre-parsed materials and products.
+    """
+    # Columns of the blueprints table, plus its rowid as id
+    COLUMNS = ('id',) + BLUEPRINT_COLUMNS
+    __slots__ = COLUMNS + ('init', 'per', 'product_list')
+
+    def __init__(self, row):
+        """
+        Record is initialised from the columns of one row of the blueprints table.
+
+        Args:
+            row (dict): Column names and values of the blueprint (including 'id').
+        """
+        for col in self.COLUMNS:
+            setattr(self, col, row.get(col))
+        # Materials are filled in by the catalog, as lists of (material, n, discount)
+        self.init = []
+        self.per = []
+        # Pairs of (product, number produced per build)
+        amounts = parse_list(self.products_n)
+        self.product_list = tuple((product, int(amounts[i]) if i < len(amounts) else 1)
+                                  for i, product in enumerate(parse_list(self.products)))
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: Column names (without id) and corresponding values, like a row of the blueprints table.
+        """
+        return {col: getattr(self, col) for col in self.COLUMNS[1:]}
+
+    def direct_cost(self):
+        """
+        Returns:
+            tuple: (initial cost dictionary, periodic cost dictionary) of one build, including credits.
+        """
+        costs = []
+        for materials, credits in ((self.init, self.init_credits), (self.per, self.per_credits)):
+            cost = {mat: n for mat, n, _ in materials}
+            # Add credit cost, if required.
+            if credits:
+                cost['Credits'] = int(credits)
+            costs.append(cost)
+
+        return tuple(costs)
+
+
+class BlueprintCatalog:
+    """
+    All blueprints of the database, loaded once into memory and keyed by both name and id.
+    """
+
+    def __init__(self, db):
+        """
+        Catalog is initialised empty, it is loaded at first use.
+
+        Args:
+            db (BppDb): Database module to load blueprints from.
+        """
+        self.db = db
+        self.by_name = None
+        self.by_id = None
+        self.names = None
+        self.producers = None
+        self.consumers = None
+        self.index = None
+        self.load_lock = Lock()     # Blueprints are loaded by one thread at a time
+
+    def load(self):
+        """ (Re)load all blueprints and their materials from the database. """
+        # Load into a new catalog, so other threads never see a partially loaded one
+        loaded = BlueprintCatalog(self.db)
+        loaded.by_name = {}
+        loaded.by_id = {}
+        loaded.names = []
+        loaded.producers = {}
+        loaded.consumers = {}
+        loaded.add_rows(*self.db.get_blueprint_rows(), self.db.get_all_materials())
+        self.by_id = loaded.by_id
+        self.names = loaded.names
+        self.producers = loaded.producers
+        self.consumers = loaded.consumers
+        self.index = None   # Built at first search
+        # Names are set last, as they mark the catalog as loaded
+        self.by_name = loaded.by_name
+
+    def add(self, bp_id):
+        """
+        Adds a blueprint that was inserted into the database after loading, instead of reloading everything.
+        Nothing needs to be done if blueprints are not loaded yet.
+
+        Args:
+            bp_id (int): Id (rowid) of the new blueprint.
+        """
+        if self.by_name is None:
+            return
+        self.add_rows(*self.db.get_blueprint_rows(bp_id), self.db.get_all_materials(bp_id))
+        self.index = None   # Rebuilt at next search
+
+    def add_rows(self, columns, rows, materials):
+        """
+        Adds blueprints to the loaded catalog, including them in the producer and consumer maps.
+
+        Args:
+            columns (list): Column names of the blueprint rows.
+            rows (list): Rows of the blueprints table (with id).
+            materials (list): Tuples of (blueprint_id, phase, material, n, discount) of the blueprints.
+        """
+        added = []
+        for row in rows:
+            bp = Blueprint(dict(zip(columns, row)))
+            self.by_id[bp.id] = bp
+            # In case of duplicate names, the first blueprint wins (as with the database queries)
+            if bp.blueprint not in self.by_name:
+                self.by_name[bp.blueprint] = bp
+                self.names.append(bp.blueprint)
+            added.append(bp)
+        for bp_id, phase, mat, n, discount in materials:
+            if bp_id in self.by_id:
+                getattr(self.by_id[bp_id], phase).append((mat, n, discount))
+
+        for bp in added:
+            # Map products to the blueprint producing them
+            for product, produced in bp.product_list:
+                self.producers[product] = (bp.blueprint, produced)
+            # Map materials to the blueprints consuming them (where-used)
+            for mat, _, _ in bp.init + bp.per:
+                self.consumers.setdefault(mat, set()).add(bp.blueprint)
+
+    def invalidate(self):
+        """ Discard loaded blueprints, they are reloaded from the database at next use. """
+        self.by_name = None
+        self.by_id = None
+        self.names = None
+        self.producers = None
+        self.consumers = None
+        self.index = None
+
+    def ensure_loaded(self):
+        """ Load blueprints if they are not in memory yet. """
+        if stats.enabled:
+            stats.cache('catalog', self.by_name is not None)
+        if self.by_name is None:
+            with self.load_lock:
+                # Another thread may have loaded the blueprints in the meantime
+                if self.by_name is None:
+                    self.load()
+
+    def get(self, bp_name):
+        """
+        Args:
+            bp_name (str): Name of the blueprint to find.
+
+        Returns:
+            Blueprint: Record of the blueprint.
+
+        Raises:
+            KeyError: If there is no blueprint with the given name.
+        """
+        self.ensure_loaded()
+        try:
+            return self.by_name[bp_name]
+        except KeyError:
+            raise KeyError('Blueprint {} not found!'.format(bp_name)) from None
+
+    def get_by_id(self, bp_id):
+        """
+        Args:
+            bp_id (int): Id (rowid) of the blueprint to find.
+
+        Returns:
+            Blueprint: Record of the blueprint.
+        """
+        self.ensure_loaded()
+        return self.by_id[bp_id]
+
+    def get_names(self):
+        """
+        Returns:
+            list: Names of all blueprints.
+        """
+        self.ensure_loaded()
+        return self.names
+
+    def get_producers(self):
+        """
+        Returns:
+            dict: Product name as key, tuple of (blueprint name, number produced per build) as value.
+        """
+        self.ensure_loaded()
+        return self.producers
+
+    def get_consumers(self):
+        """
+        Returns:
+            dict: Material name as key, set of names of the blueprints directly requiring it as value.
+        """
+        self.ensure_loaded()
+        return self.consumers
+
+    def get_index(self):
+        """
+        Returns:
+            NameIndex: Search index over the names of all blueprints.
+        """
+        self.ensure_loaded()
+        if self.index is None:
+            self.index = NameIndex(self.names)
+        return self.index
 
 
 class BppLogic:
@@ -12,25 +316,27 @@ class BppLogic:
     Also acts as intermediary between application and database.
     """
 
-    def __init__(self, db_file=None):
+    def __init__(self, db_file=None, journal_limit=256 * 1024):
         """
         Class is initialised by initialising the database.
 
         Args:
             db_file (str): Name (and location) of the database file
+            journal_limit (int): Size (in bytes) of the change journal above which it is compacted into the dump.
         """
         # Keep track whether the database has changed this session
         self.db_change = False
+        self.db_patched = False     # Patched databases are not customised, but their journal may need compacting
         # Use standard database location if no location is provided
         if db_file is None:
-            db_file = 'bpp.db'
+            db_file = DB_FILE
         # Determine whether given file is a database or dump
         if db_file[-3:] != '.db':
             # The file doesn't end with .db, so it's probably a dump
             if isfile(db_file):
                 # Dump exists, so read that into standard database location
                 dump_file = db_file
-                db_file = 'bpp.db'
+                db_file = DB_FILE
             else:
                 # Dump doesn't even exist... Just fail.
                 raise FileNotFoundError('Cannot find specified dump file ({})!'.format(db_file))
@@ -41,15 +347,60 @@ class BppLogic:
             else:
                 # Database does not exist yet, resort to standard dump location
                 print('Database not found, resorting to default dump location.')
-                dump_file = 'bpp_db.sql'
+                dump_file = DUMP_FILE
+
+        # In case of dump, prefer a binary snapshot of the same dump (much faster than replaying it)
+        snapshot = False
+        if dump_file:
+            dump_hash = file_hash(dump_file)
+            key = BppDb.read_snapshot_key(self.snapshot_file(dump_file))
+            if key is not None and key[0] == dump_hash:
+                # A write-ahead log left behind by an earlier session does not belong to the copied snapshot
+                for wal_file in (db_file + '-wal', db_file + '-shm'):
+                    if isfile(wal_file):
+                        remove(wal_file)
+                copyfile(self.snapshot_file(dump_file), db_file)
+                snapshot = True
 
         # Prepare database module
         self.db = BppDb(db_file)
         self.db.create_connection()     # Also creates database if it doesn't exist yet
         # Initialise database in case of dump
-        if dump_file:
+        if snapshot:
+            print('Initialising database from snapshot of dump file: ' + dump_file)
+            self.db.drop_snapshot_key()
+        elif dump_file:
             print('Initialising database from dump file: ' + dump_file)
             self.db.initialise_database(dump_file)
+            self.db.save_snapshot(self.snapshot_file(dump_file), dump_hash)
+        if dump_file:
+            self.db.set_origin(dump_hash)
+        # Ensure materials are available in normalised form (migrates databases from before its introduction)
+        self.db.migrate_materials()
+        # Ensure kit module stats are available (migrates databases from before their introduction)
+        self.db.migrate_kit_modules()
+        self.db.migrate_indexes()
+        # Ensure local customisations are tracked, so database patches leave them untouched
+        self.db.migrate_custom()
+
+        # Changes are journaled instead of rewriting the entire dump every session
+        self.journal = BppJournal(DUMP_FILE + '.journal')
+        self.journal_limit = journal_limit
+        # A database from another dump no longer matches the standard dump and journal, so write it out at stop
+        self.compact_on_stop = dump_file is not None and abspath(dump_file) != abspath(DUMP_FILE)
+        if dump_file and not self.compact_on_stop:
+            # Bring database up to date with changes made since the dump was written
+            if self.journal.dump_hash() == dump_hash:
+                n = self.journal.replay(self.db, dump_hash)
+                if n:
+                    print('Replayed {} change(s) from journal: {}'.format(n, self.journal.journal_file))
+            else:
+                if self.journal.entries():
+                    print('Discarded journal of another dump: {}'.format(self.journal.journal_file))
+                self.journal.reset(dump_hash)
+        # Only changes to the standard database built from the standard dump are journaled (others keep them)
+        self.journaled = not self.compact_on_stop and abspath(db_file) == abspath(DB_FILE) \
+            and self.db.get_origin() is not None and self.db.get_origin() == self.journal.dump_hash()
 
         # Initialize kit setup module with database module
         self.kits = KitSetup(self.db)
@@ -59,6 +410,28 @@ class BppLogic:
         self.per_cost = {}
         self.total_cost = {}
 
+        # Held while changing the database or calculating on another thread (see bpp_worker)
+        self.lock = RLock()
+        # All blueprints in memory, and cache for recursive cost calculation (emptied whenever blueprints change)
+        self.catalog = BlueprintCatalog(self.db)
+        self.bom_cache = {}     # Blueprint -> basic commodities of one build
+        self.cost_matrix = None     # Basic commodities of every blueprint at once
+        self.plans = {}     # Blueprint -> compiled recipe tree for bulk builds
+        self.bulk_costs = {}    # (Blueprint, builds) -> basic commodities of a bulk build
+        # Bulk discount curve (no discount unless the database defines one)
+        self.discount = BulkDiscount(float(self.db.get_variable('bulk_discount_exponent', 1)))
+
+    @staticmethod
+    def snapshot_file(dump_file):
+        """
+        Args:
+            dump_file (str): Location of a dump file.
+
+        Returns:
+            str: Location of the binary snapshot belonging to the dump file.
+        """
+        return dump_file + '.snap'
+
     def get_db_version(self):
         """
         Retrieve database version.
@@ -70,17 +443,69 @@ class BppLogic:
             return self.db.get_db_version()
         return 'No database connected!'
 
-    def check_db_version(self):
-        """ Placeholder to check whether there is a new database available. """
-        pass
+    def check_db_version(self, patch_dir=PATCH_DIR):
+        """
+        Checks whether there are patches for the database and applies them all in a single transaction.
+        Blueprints that were added or changed locally are kept, as is the customisation suffix ('c') of the version.
+
+        Args:
+            patch_dir (str): Directory holding the patches (see bpp_patch).
+
+        Returns:
+            dict: Versions ('from' and 'to') and number of blueprints added, changed, removed and kept
+                (see BppDb.apply_patches), or None if the database is up to date.
+
+        Raises:
+            ValueError: If a patch contains an invalid blueprint (the database is left unchanged).
+        """
+        if not isdir(patch_dir):
+            return None
+        version = self.db.get_db_version()
+        chain = patch_chain(read_patches(patch_dir), version[:-1] if version.endswith('c') else version)
+        if not chain:
+            return None
+
+        # Validate everything before changing anything
+        for patch in chain:
+            blueprints = patch.setdefault('blueprints', {})
+            for change in ('added', 'changed'):
+                blueprints[change] = [validate_blueprint(bp) for bp in blueprints.get(change, [])]
+
+        with self.lock:
+            result = self.db.apply_patches(chain)
+            self.record('apply_patches', patches=chain)
+            self.db_patched = True
+            self.database_updated()
+        result.update({'from': version, 'to': self.db.get_db_version()})
+        return result
+
+    def database_updated(self):
+        """ Reloads everything derived from the database, after it was changed (e.g. patched) elsewhere. """
+        with self.lock:
+            self.blueprints_changed()
+            self.kits = KitSetup(self.db)
+            self.discount = BulkDiscount(float(self.db.get_variable('bulk_discount_exponent', 1)))
 
     def get_all_blueprints(self):
         """ Query all blueprints from the blueprints table.
 
         Returns:
-            A list of all blueprints in the database.
+            A list of all blueprints in the database (a copy, changing it does not affect the loaded blueprints).
         """
-        return self.db.get_all_blueprints()
+        return list(self.catalog.get_names())
+
+    @instrumented
+    def search_blueprints(self, query, limit=None):
+        """ Finds blueprints by (part of) their name.
+
+        Args:
+            query (str): Text to search for, case insensitive. Returns all blueprints if empty.
+            limit (int, optional): Maximum number of blueprints to return.
+
+        Returns:
+            list: Names of matching blueprints, best matches first.
+        """
+        return self.catalog.get_index().search(query, limit)
 
     def find_blueprint(self, bp_name):
         """ Retrieves all information about a specified blueprint.
@@ -91,7 +516,7 @@ class BppLogic:
             Complete results found for specified blueprint name.
         """
         # Returns dictionary with column names as keys and corresponding values
-        return self.db.find_blueprint(bp_name)
+        return self.catalog.get(bp_name).as_dict()
 
     def add_blueprint(self, bp):
         """
@@ -101,12 +526,220 @@ class BppLogic:
             bp (dict): Blueprint in dictionary format (containing name, materials etc.).
         """
         # Database insert
-        self.db.insert_blueprint(bp.pop('name'), bp.pop('products'), **bp)
-        self.db_change = True   # Blueprint inserted, so database changed
+        name, products = bp.pop('name'), bp.pop('products')
+        with self.lock:
+            bp_id = self.db.insert_blueprint(name, products, **bp)
+            self.record('insert_blueprint', bp=name, products=products, **bp)
+            self.db_change = True   # Blueprint inserted, so database changed
+            # Only the new blueprint needs loading, but it may produce materials of others
+            self.catalog.add(bp_id)
+            self.costs_changed()
+
+    def blueprints_changed(self):
+        """ Discards loaded blueprints and cached costs, as new blueprints may produce materials of others. """
+        with self.lock:
+            self.catalog.invalidate()
+            self.costs_changed()
+
+    def costs_changed(self):
+        """ Discards cached costs. """
+        with self.lock:
+            self.bom_cache = {}
+            self.cost_matrix = None
+            self.plans = {}
+            self.bulk_costs = {}
+
+    def add_blueprints(self, records):
+        """
+        Adds many blueprints to the database at once. Invalid records are skipped and reported.
+
+        Args:
+            records (iterable): Blueprints in dictionary format (containing name, products, materials etc.).
+
+        Returns:
+            tuple: (Number of blueprints added, list of (record index, error message) for skipped records)
+        """
+        valid = []
+        errors = []
+        for i, record in enumerate(records):
+            try:
+                valid.append(validate_blueprint(record))
+            except ValueError as e:
+                errors.append((i, str(e)))
+
+        if valid:
+            # Database insert in a single transaction
+            with self.lock:
+                self.db.insert_blueprints(valid)
+                self.record('insert_blueprints', records=valid)
+                self.db_change = True
+                self.blueprints_changed()
+
+        return len(valid), errors
+
+    def import_blueprints(self, file_name):
+        """
+        Adds all blueprints from a CSV or JSON file to the database.
+
+        Args:
+            file_name (str): Location of the file to import.
+
+        Returns:
+            tuple: (Number of blueprints added, list of (record index, error message) for skipped records)
+        """
+        return self.add_blueprints(read_blueprints(file_name))
+
+    def direct_cost(self, bp_name):
+        """
+        Retrieves initial and periodic materials (including credits) of one build of a blueprint.
 
+        Args:
+            bp_name (str): Name of the blueprint.
+
+        Returns:
+            tuple: (initial cost dictionary, periodic cost dictionary) of one build.
+        """
+        return self.catalog.get(bp_name).direct_cost()
+
+    def explode(self, bp_name):
+        """
+        Recursively expands one build of a blueprint into basic commodities.
+        Results are memoized per blueprint, so every sub-blueprint is only expanded once.
+        Sub-blueprints are expanded from an explicit stack, so recipe chains of any depth can be expanded.
+
+        Args:
+            bp_name (str): Name of the blueprint to expand.
+
+        Returns:
+            dict: Basic commodities (and credits) required for one build of the blueprint.
+
+        Raises:
+            ValueError: If the blueprint (indirectly) requires its own product.
+        """
+        if stats.enabled:
+            stats.cache('bom', bp_name in self.bom_cache)
+        if bp_name in self.bom_cache:
+            return self.bom_cache[bp_name]
+
+        producers = self.catalog.get_producers()
+        stack = [bp_name]
+        expanding = set()   # Blueprints waiting for their sub-blueprints, to detect cycles
+        while stack:
+            name = stack[-1]
+            if name in self.bom_cache:
+                # Also required by another blueprint expanded in the meantime
+                stack.pop()
+            elif name not in expanding:
+                # Expand sub-blueprints first
+                expanding.add(name)
+                for cost in self.direct_cost(name):
+                    for mat in cost:
+                        sub_bp = producers[mat][0] if mat in producers else None
+                        if sub_bp is None or sub_bp in self.bom_cache:
+                            continue
+                        if sub_bp in expanding:
+                            raise ValueError('Cyclic recipe detected for blueprint {}!'.format(sub_bp))
+                        stack.append(sub_bp)
+            else:
+                # All sub-blueprints are expanded
+                vector = {}
+                for cost in self.direct_cost(name):
+                    self.add_exploded(vector, cost)
+                self.bom_cache[name] = vector
+                expanding.discard(name)
+                stack.pop()
+
+        return self.bom_cache[bp_name]
+
+    def add_exploded(self, vector, cost):
+        """
+        Adds the basic commodities of a dictionary of (possibly intermediate) materials to a given vector.
+
+        Args:
+            vector (dict): Basic commodities to add to (modified in place).
+            cost (dict): Materials with required amounts.
+        """
+        producers = self.catalog.get_producers()
+        for mat, n in cost.items():
+            if mat in producers:
+                # Intermediate product, expand its blueprint and scale by the amount produced per build
+                sub_bp, produced = producers[mat]
+                factor = n // produced if n % produced == 0 else n / produced
+                for sub_mat, sub_n in self.explode(sub_bp).items():
+                    vector[sub_mat] = vector.get(sub_mat, 0) + factor * sub_n
+            else:
+                # Basic commodity
+                vector[mat] = vector.get(mat, 0) + n
+
+    @instrumented
+    def browse_blueprints(self, filters=None, after=None, limit=100):
+        """
+        Retrieves one page of the blueprint table, filtered in the database.
+
+        Args:
+            filters (dict, optional): Filters, any of tech_min, tech_max, source, material and text
+                (see BppDb.filter_clause).
+            after (tuple, optional): (name, id) of the last blueprint of the previous page.
+            limit (int): Maximum number of blueprints on the page.
+
+        Returns:
+            list: Blueprints as dictionaries with id, blueprint, tech, source, manhours and products.
+        """
+        return [dict(zip(BROWSE_COLUMNS, row)) for row in self.db.get_blueprint_page(filters, after, limit)]
+
+    def count_blueprints(self, filters=None):
+        """
+        Args:
+            filters (dict, optional): Filters (see browse_blueprints).
+
+        Returns:
+            int: Number of blueprints matching the filters.
+        """
+        return self.db.count_blueprints(filters)
+
+    def get_sources(self):
+        """
+        Returns:
+            list: All sources of blueprints, to filter on.
+        """
+        return self.db.get_sources()
+
+    @instrumented
+    def where_used(self, material, transitive=False):
+        """
+        Finds the blueprints requiring a material (or component), either directly or also through the blueprints
+        of intermediate products requiring it.
+
+        Args:
+            material (str): Name of the material or component.
+            transitive (bool): Whether to include blueprints requiring it indirectly.
+
+        Returns:
+            list: Pairs of (blueprint name, depth), where depth 1 means the blueprint requires the material itself,
+                depth 2 means it requires a product of a depth 1 blueprint etc. Ordered by depth and name.
+        """
+        consumers = self.catalog.get_consumers()
+        used = {}
+        depth = 1
+        frontier = [material]
+        while frontier:
+            products = []
+            for mat in frontier:
+                for bp_name in consumers.get(mat, ()):
+                    if bp_name not in used:
+                        used[bp_name] = depth
+                        products.extend(product for product, _ in self.catalog.get(bp_name).product_list)
+            # Products of the blueprints found are required by the next level of blueprints
+            frontier = products if transitive else []
+            depth += 1
+
+        return sorted(used.items(), key=lambda item: (item[1], item[0]))
+
+    @instrumented
     def calculate_cost(self, bp_name):
         """
         Calculates the cost of a specified blueprint in basic commodities.
+        Intermediate products are recursively expanded into the basic commodities of their blueprints.
 
         Args:
             bp_name (str): Name of the blueprint to calculate cost for in basic commodities.
@@ -114,58 +747,110 @@ class BppLogic:
         Returns:
             Dictionary of total costs in basic commodities for the blueprint's product.
         """
-        # Empty all dictionaries
+        # Expand initial and periodic costs separately
+        init_cost, per_cost = self.direct_cost(bp_name)
         self.init_cost = {}
+        self.add_exploded(self.init_cost, init_cost)
         self.per_cost = {}
-        self.total_cost = {}
+        self.add_exploded(self.per_cost, per_cost)
 
-        # Retrieve (dictionary of) blueprint
-        bp = self.db.find_blueprint(bp_name)
-        # Extract initial costs and put into dict
-        in_mats = bp['init_materials']
-        # Determine if there are initial materials and discern whether there are multiple
-        if in_mats:
-            # Only add initial materials if they are required
-            if in_mats[0] == '[':
-                # Starts with bracket, so multiple materials. Remove brackets, remove spaces and split.
-                self.init_cost = dict(
-                    zip([m.strip() for m in in_mats[1:-1].split(',')],
-                        [int(m.strip()) for m in bp['init_materials_n'][1:-1].split(',')]))
-            else:
-                # Single material, put material and count in dictionary
-                self.init_cost = {in_mats: int(bp['init_materials_n'])}
-        # Add initial credit cost, if required.
-        if bp['init_credits']:
-            self.init_cost['Credits'] = int(bp['init_credits'])
-
-        # Extract periodic costs and put into dict
-        per_mats = bp['per_materials']
-        # Determine if there are periodic materials and discern whether there are multiple
-        if per_mats:
-            # Only add periodic materials if they are required
-            if per_mats[0] == '[':
-                # Starts with bracket, so multiple materials. Remove brackets, split and remove spaces.
-                self.per_cost = dict(
-                    zip([m.strip() for m in per_mats[1:-1].split(',')],
-                        [int(m.strip()) for m in bp['per_materials_n'][1:-1].split(',')]))
-            else:
-                # Single material, put material and count in dictionary
-                self.per_cost = {per_mats: int(bp['per_materials_n'])}
-        # Add periodic credit cost, if required.
-        if bp['per_credits']:
-            self.per_cost['Credits'] = int(bp['per_credits'])
-
-        # Construct total costs dictionary by adding periodic to initial materials
-        self.total_cost = self.init_cost.copy()     # Copy entire init_cost. Dict is reference by default.
-        for mat, n in self.per_cost.items():
-            if mat in self.init_cost:
-                self.total_cost[mat] += n
-            else:
-                self.total_cost[mat] = n
+        # Total costs are memoized, copy to keep the cache intact
+        self.total_cost = self.explode(bp_name).copy()
 
         # Return dictionary of total costs
         return self.total_cost
 
+    def cost_table(self):
+        """
+        Calculates the cost in basic commodities of every blueprint at once (cached until blueprints change).
+
+        Returns:
+            CsrMatrix: Sparse matrix of blueprints (rows) by basic commodities and credits (columns),
+                holding the cost of one build.
+        """
+        if stats.enabled:
+            stats.cache('cost_matrix', self.cost_matrix is not None)
+        if self.cost_matrix is None:
+            self.cost_matrix = compile_cost_matrix(self.catalog)
+        return self.cost_matrix
+
+    @instrumented
+    def calculate_bulk_cost(self, bp_name, n):
+        """
+        Calculates the cost in basic commodities of building a blueprint several times at once,
+        applying the bulk discount to flagged materials of the blueprint and of all its sub-blueprints.
+        The recipe tree is compiled once per blueprint, so changing the amount requires no lookups.
+
+        Args:
+            bp_name (str): Name of the blueprint.
+            n (int): Number of builds.
+
+        Returns:
+            dict: Total basic commodities (and credits) required.
+        """
+        if self.discount.exponent == 1:
+            # Without discount, bulk builds cost the same as single builds
+            return {mat: n * cost for mat, cost in self.explode(bp_name).items()}
+        key = (bp_name, n)
+        if stats.enabled:
+            stats.cache('bulk_costs', key in self.bulk_costs)
+        if key not in self.bulk_costs:
+            if stats.enabled:
+                stats.cache('plans', bp_name in self.plans)
+            if len(self.bulk_costs) >= MAX_BULK_COSTS:
+                self.bulk_costs.clear()
+            # Shared sub-blueprints are only evaluated once per bulk build
+            cost = {}
+            evaluate_plan(compile_plan(self.catalog, bp_name, self.plans), n, self.discount, cost)
+            self.bulk_costs[key] = cost
+        # Copy to keep the cache intact
+        return self.bulk_costs[key].copy()
+
+    @instrumented
+    def calculate_build_order(self, order):
+        """
+        Calculates the combined cost of building several blueprints, in basic commodities.
+        Every line of the order is a bulk build, so the bulk discount applies as in calculate_bulk_cost.
+
+        Args:
+            order (iterable or dict): Pairs of (blueprint name, number of builds), duplicates are added up.
+
+        Returns:
+            dict: Total basic commodities (and credits) required for the entire order.
+        """
+        if isinstance(order, dict):
+            order = order.items()
+        shopping_list = {}
+        if self.discount.exponent == 1:
+            # Without discount, bulk builds cost the same as single builds
+            for bp_name, n in order:
+                for mat, cost in self.explode(bp_name).items():
+                    shopping_list[mat] = shopping_list.get(mat, 0) + n * cost
+        else:
+            # Sub-blueprints shared by several lines are only evaluated once per number of builds
+            memo = {}
+            for bp_name, n in order:
+                evaluate_plan(compile_plan(self.catalog, bp_name, self.plans), n, self.discount, shopping_list, memo)
+
+        return shopping_list
+
+    def schedule_build_order(self, order, builders):
+        """
+        Schedules an order, including all sub-component builds, over several builders based on the manhours
+        and maximum workforce of every blueprint.
+
+        Args:
+            order (iterable or dict): Pairs of (blueprint name, number of builds).
+            builders (list): Workforce available at every builder (e.g. kit).
+
+        Returns:
+            dict: Schedule with makespan, critical path and jobs per builder (see bpp_schedule.schedule_order).
+        """
+        if isinstance(order, dict):
+            order = order.items()
+        return schedule_order(self.catalog, order, builders)
+
+    @instrumented
     def calculate_exe_setup(self, tech=16, ee=30, met=0, nuc=0, sil=0, oat=0, bao=0):
         """
         Calculates optimal configuration of an ExE kit, given skill level, kit tech and extraction slots.
@@ -180,19 +865,163 @@ class BppLogic:
             bao (int): Baobabs slots available on celestial body.
 
         Returns:
-            str: String of optimal ExE kit setup
+            ExeSetup: Setup of the kit, or None if the kit tech is too low for any extractor.
         """
         # Just pass everything to Activate's script, lol
         return self.kits.exe_base_setup(tech, ee_level=ee, metals=met, nukes=nuc, silicon=sil, oats=oat, baobabs=bao)
 
+    def get_kit_modules(self, kit):
+        """
+        Args:
+            kit (str): Type of kit (e.g. 'prod' or 'colony').
+
+        Returns:
+            list: Names of all modules that can be equipped on the kit.
+        """
+        return self.kits.get_modules(kit)
+
+    @instrumented
+    def calculate_kit_setup(self, kit, tech=16, modules=None):
+        """
+        Calculates workforce and commodity flows of a kit of any type, given kit tech and modules to equip.
+
+        Args:
+            kit (str): Type of kit (e.g. 'prod' or 'colony').
+            tech (int): Tech level of the kit.
+            modules (dict, optional): Number of every module (by name) to equip.
+
+        Returns:
+            ModuleSetup: Setup of the kit.
+
+        Raises:
+            ValueError: If a module is unknown or requires a higher kit tech.
+        """
+        return self.kits.kit_setup(kit, tech, modules or {})
+
+    def record(self, method, **kwargs):
+        """
+        Journals a change made to the database, if it was built from the standard dump.
+
+        Args:
+            method (str): Name of the BppDb method that made the change.
+            **kwargs (any): Arguments the method was called with.
+        """
+        if self.journaled:
+            self.journal.append(method, **kwargs)
+
+    def compact(self):
+        """ Writes the entire database into the dump and empties the change journal. """
+        self.db.dump(DUMP_FILE)
+        dump_hash = file_hash(DUMP_FILE)
+        self.db.set_origin(dump_hash)
+        # Keep snapshot in line with the new dump
+        self.db.save_snapshot(self.snapshot_file(DUMP_FILE), dump_hash)
+        # From now on the database is built from the standard dump, so journal changes on top of it
+        self.journal.reset(dump_hash)
+        self.journaled = True
+        self.compact_on_stop = False
+
+    def plan_exe_batch(self, file_name, processes=None):
+        """
+        Calculates ExE kit setups for many celestial bodies at once, spread over several processes.
+
+        Args:
+            file_name (str): CSV file with columns body, tech, ee, met, nuc, sil, oat and bao.
+            processes (int, optional): Number of worker processes (defaults to the number of cores).
+
+        Returns:
+            list: One row (dictionary) per body with body, ee and all fields of its setup (see ExeSetup.as_dict),
+                or body and error.
+        """
+        return plan_bodies(self.db.db_file, read_bodies(file_name), processes)
+
+    def export_exe_sweep(self, file_name, max_slots=30, ee_levels=range(31)):
+        """
+        Writes a table of ExE kit requirements for every extractor tech, Extraction Expert level, commodity
+        and number of slots (requires NumPy, and pyarrow for Parquet).
+
+        Args:
+            file_name (str): Output file, written as Parquet if it ends with .parquet and as CSV otherwise.
+            max_slots (int): Highest number of slots in the table.
+            ee_levels (iterable): Extraction Expert levels in the table.
+
+        Returns:
+            int: Number of rows written.
+        """
+        from bpp_sweep import sweep_exe, write_csv, write_parquet   # Optional dependencies
+
+        chunks = sweep_exe(self.kits, ee_levels=ee_levels, max_slots=max_slots)
+        if file_name.endswith('.parquet'):
+            return write_parquet(file_name, chunks)
+        return write_csv(file_name, chunks)
+
+    @instrumented
+    def optimise_exe_setup(self, tech=16, ee=30, met=0, nuc=0, sil=0, oat=0, bao=0, cap=None,
+                           sort_by='output_per_worker'):
+        """
+        Searches the Pareto-best configurations of an ExE kit, given skill level, kit tech and maximum extraction slots.
+
+        Args:
+            tech (int): Tech level of the kit.
+            ee (int): Extraction Expert level of the character holding the kit.
+            met (int): Maximum Metals slots available on celestial body.
+            nuc (int): Maximum Nuclear Waste slots available on celestial body.
+            sil (int): Maximum Silicon slots available on celestial body.
+            oat (int): Maximum Space Oats slots available on celestial body.
+            bao (int): Maximum Baobabs slots available on celestial body.
+            cap (int, optional): Maximum number of workers on the kit.
+            sort_by (str): Ranking of the setups, either 'output_per_worker' (highest first)
+                or 'credits' (lowest credits/month first).
+
+        Returns:
+            list: Setups (ExeSetup), best first.
+        """
+        max_slots = dict(zip(self.kits.COMMODS, (met, nuc, sil, oat, bao)))
+        return self.kits.optimise_exe_setup(tech, ee_level=ee, max_slots=max_slots, worker_cap=cap, sort_by=sort_by)
+
+    @staticmethod
+    def set_instrumentation(enabled):
+        """
+        Switches collection of query and calculation timings and cache hits on or off.
+
+        Args:
+            enabled (bool): Whether to collect.
+        """
+        if enabled:
+            stats.enable()
+        else:
+            stats.disable()
+
+    @staticmethod
+    def get_statistics():
+        """
+        Returns:
+            dict: Summary of the collected timings and cache hits (see Instrumentation.summary).
+        """
+        return stats.summary()
+
+    @staticmethod
+    def export_statistics(file_name):
+        """
+        Writes all collected timings and cache hits to a JSON file.
+
+        Args:
+            file_name (str): Location of the file.
+        """
+        stats.export(file_name)
+
     def stop(self):
         """Gracefully close database connection when application is stopped."""
-        # If database was changed this session, update version and dump
+        # If database was changed this session, update version
         if self.db_change:
             # Determine current version and adapt if needed
             version = self.db.get_db_version()
             if version[-1] != 'c':
                 version += 'c'  # Add c to version to indicate customised version
-            self.db.replace_variable('db_version', version)     # Store new version number
-            self.db.dump('bpp_db.sql')
+                self.db.replace_variable('db_version', version)     # Store new version number
+                self.record('replace_variable', variable='db_version', value=version)
+        if self.db_change or self.db_patched:
+            # Changes are already journaled, only rewrite the dump when the journal grows too large
+            if self.compact_on_stop or (self.journaled and self.journal.size() > self.journal_limit):
+                self.compact()
         self.db.close_connection()
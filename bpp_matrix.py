@@ -0,0 +1,150 @@
+from collections import deque
+
+
+class CsrMatrix:
+    """
+    Sparse matrix in compressed sparse row (CSR) format, with labelled rows and columns.
+    """
+
+    def __init__(self, row_labels, col_labels, indptr, indices, data):
+        """
+        Args:
+            row_labels (list): Label of every row.
+            col_labels (list): Label of every column.
+            indptr (list): Start of every row in indices/data, followed by the total number of entries.
+            indices (list): Column of every entry.
+            data (list): Value of every entry.
+        """
+        self.row_labels = row_labels
+        self.col_labels = col_labels
+        self.row_index = {label: i for i, label in enumerate(row_labels)}
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    @property
+    def shape(self):
+        """
+        Returns:
+            tuple: (Number of rows, number of columns)
+        """
+        return len(self.row_labels), len(self.col_labels)
+
+    def row(self, label):
+        """
+        Args:
+            label (str): Label of the row.
+
+        Returns:
+            dict: Column labels and values of all (non-zero) entries in the row.
+        """
+        i = self.row_index[label]
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return {self.col_labels[j]: v for j, v in zip(self.indices[start:end], self.data[start:end])}
+
+    def to_dense(self):
+        """
+        Returns:
+            list: Rows as lists of values (zero where there is no entry).
+        """
+        dense = []
+        for i in range(len(self.row_labels)):
+            row = [0] * len(self.col_labels)
+            for k in range(self.indptr[i], self.indptr[i + 1]):
+                row[self.indices[k]] = self.data[k]
+            dense.append(row)
+        return dense
+
+    def to_numpy(self):
+        """
+        Returns:
+            numpy.ndarray: Dense array of the matrix (requires NumPy).
+        """
+        import numpy   # Optional dependency, only needed for this conversion
+        return numpy.array(self.to_dense(), dtype=float)
+
+
+def compile_cost_matrix(catalog):
+    """
+    Solves the basic commodity cost of one build of every blueprint in a catalog in one pass.
+    The recipes form a sparse matrix of blueprints by materials, which is solved in topological order
+    (sub-blueprints before the blueprints requiring them), so every row is derived from already solved rows.
+
+    Args:
+        catalog (BlueprintCatalog): Catalog of all blueprints.
+
+    Returns:
+        CsrMatrix: Blueprints (rows, in topological order) by basic commodities and credits (columns).
+
+    Raises:
+        ValueError: If recipes are cyclic.
+    """
+    names = catalog.get_names()
+    producers = catalog.get_producers()
+    bp_index = {name: i for i, name in enumerate(names)}
+
+    # Recipe matrix of every blueprint as (blueprint or basic commodity, amount) entries
+    recipes = []
+    dependents = [[] for _ in names]
+    waiting = [0] * len(names)   # Number of distinct sub-blueprints not solved yet
+    for i, name in enumerate(names):
+        recipe = {}
+        for cost in catalog.get(name).direct_cost():
+            for mat, n in cost.items():
+                if mat in producers:
+                    sub_bp, produced = producers[mat]
+                    key = bp_index[sub_bp]
+                    amount = n // produced if n % produced == 0 else n / produced
+                else:
+                    key = mat
+                    amount = n
+                recipe[key] = recipe.get(key, 0) + amount
+        recipes.append(recipe)
+        for key in recipe:
+            if isinstance(key, int):
+                dependents[key].append(i)
+                waiting[i] += 1
+
+    # Solve rows in topological order
+    commodities = []
+    col_index = {}
+    solved = [None] * len(names)
+    order = []
+    queue = deque(i for i, n in enumerate(waiting) if n == 0)
+    while queue:
+        i = queue.popleft()
+        row = {}
+        for key, amount in recipes[i].items():
+            if isinstance(key, int):
+                # Sub-blueprint: add its (solved) row
+                for col, v in solved[key].items():
+                    row[col] = row.get(col, 0) + amount * v
+            else:
+                # Basic commodity
+                if key not in col_index:
+                    col_index[key] = len(commodities)
+                    commodities.append(key)
+                col = col_index[key]
+                row[col] = row.get(col, 0) + amount
+        solved[i] = row
+        order.append(i)
+        for dep in dependents[i]:
+            waiting[dep] -= 1
+            if waiting[dep] == 0:
+                queue.append(dep)
+
+    if len(order) < len(names):
+        cyclic = sorted(names[i] for i in range(len(names)) if solved[i] is None)
+        raise ValueError('Cyclic recipes detected for blueprints: {}'.format(', '.join(cyclic)))
+
+    # Compress solved rows
+    indptr = [0]
+    indices = []
+    data = []
+    for i in order:
+        for col in sorted(solved[i]):
+            indices.append(col)
+            data.append(solved[i][col])
+        indptr.append(len(indices))
+
+    return CsrMatrix([names[i] for i in order], commodities, indptr, indices, data)
@@ -0,0 +1,142 @@
+"""Blue Photon Processor+ database patches
+
+A patch holds the changes between two database versions, so an update only needs the changes instead of
+the entire dump. Patches are JSON files like:
+
+    {"from": "0.3", "to": "0.4",
+     "blueprints": {"added": [{"blueprint": ..., "products": ..., ...}],
+                    "changed": [{"blueprint": ..., ...}],
+                    "removed": ["<blueprint name>"]},
+     "variables": {"set": {"<variable>": "<value>"}, "removed": ["<variable>"]}}
+
+Blueprints are given with all columns of the blueprints table. A patch between two databases is made with:
+
+    python -m bpp_patch old.db new.db patches/0.3_0.4.json
+"""
+
+# Project stuff
+from bpp_db import BLUEPRINT_COLUMNS
+
+# Standard library stuff
+from argparse import ArgumentParser
+from glob import glob
+from json import dump, load
+from os.path import join
+from sqlite3 import connect
+import sys
+
+
+def read_patches(patch_dir):
+    """
+    Reads all patches (.json files) in a directory.
+
+    Args:
+        patch_dir (str): Directory holding the patches.
+
+    Returns:
+        dict: Patches by the version they apply to ('from').
+
+    Raises:
+        ValueError: If a patch misses its versions.
+    """
+    patches = {}
+    for file_name in sorted(glob(join(patch_dir, '*.json'))):
+        with open(file_name, 'r') as f:
+            patch = load(f)
+        if 'from' not in patch or 'to' not in patch:
+            raise ValueError('Patch {} does not state the versions it is between'.format(file_name))
+        patches[str(patch['from'])] = patch
+    return patches
+
+
+def patch_chain(patches, version):
+    """
+    Determines which patches bring a database from its version to the newest version available.
+
+    Args:
+        patches (dict): Patches by the version they apply to.
+        version (str): Current version of the database (without customisation suffix).
+
+    Returns:
+        list: Patches in order of application (empty if the database is up to date).
+    """
+    chain = []
+    seen = set()
+    while version in patches and version not in seen:
+        seen.add(version)
+        chain.append(patches[version])
+        version = str(patches[version]['to'])
+    return chain
+
+
+def read_database(db_file):
+    """
+    Reads the blueprints and variables of a database.
+
+    Args:
+        db_file (str): Location of the database file.
+
+    Returns:
+        tuple: (blueprints by name (dictionaries of all columns), variables by name)
+    """
+    con = connect(db_file)
+    try:
+        blueprints = {}
+        for row in con.execute("SELECT {} FROM blueprints ORDER BY rowid".format(', '.join(BLUEPRINT_COLUMNS))):
+            # In case of duplicate names, the first blueprint wins (as with the database queries)
+            blueprints.setdefault(row[0], dict(zip(BLUEPRINT_COLUMNS, row)))
+        variables = dict(con.execute("SELECT variable, value FROM bpp_variables").fetchall())
+    finally:
+        con.close()
+    return blueprints, variables
+
+
+def make_patch(old_db, new_db):
+    """
+    Determines the changes between two databases.
+
+    Args:
+        old_db (str): Location of the database to patch.
+        new_db (str): Location of the database after patching.
+
+    Returns:
+        dict: Patch (see module documentation).
+    """
+    old_bps, old_vars = read_database(old_db)
+    new_bps, new_vars = read_database(new_db)
+    return {'from': old_vars.get('db_version'),
+            'to': new_vars.get('db_version'),
+            'blueprints': {'added': [bp for name, bp in new_bps.items() if name not in old_bps],
+                           'changed': [bp for name, bp in new_bps.items() if name in old_bps and bp != old_bps[name]],
+                           'removed': [name for name in old_bps if name not in new_bps]},
+            'variables': {'set': {var: value for var, value in new_vars.items()
+                                  if var != 'db_version' and old_vars.get(var) != value},
+                          'removed': [var for var in old_vars if var not in new_vars]}}
+
+
+def main(argv=None):
+    """
+    Command line entry point, writes the patch between two databases.
+
+    Args:
+        argv (list, optional): Command line arguments (defaults to those of the process).
+
+    Returns:
+        int: Exit code.
+    """
+    parser = ArgumentParser(prog='python -m bpp_patch', description='Make a patch between two BPP+ databases.')
+    parser.add_argument('old', help='Database (.db) to patch.')
+    parser.add_argument('new', help='Database (.db) after patching.')
+    parser.add_argument('patch', help='File to write the patch to (.json).')
+    args = parser.parse_args(argv)
+
+    patch = make_patch(args.old, args.new)
+    with open(args.patch, 'w') as f:
+        dump(patch, f, indent=1)
+    print('Patch from {} to {}: {} added, {} changed, {} removed blueprint(s)'.format(
+        patch['from'], patch['to'], *(len(patch['blueprints'][key]) for key in ('added', 'changed', 'removed'))))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+from heapq import heappop, heappush
+from itertools import count
+from math import ceil
+
+
+def expand_order(catalog, order):
+    """
+    Determines how many (whole) builds of every blueprint, including sub-blueprints, an order requires.
+
+    Args:
+        catalog (BlueprintCatalog): Catalog of all blueprints.
+        order (iterable): Pairs of (blueprint name, number of builds).
+
+    Returns:
+        tuple: (Builds per blueprint (dict), sub-blueprints per blueprint (dict of sets),
+            blueprints in topological order with sub-blueprints first (list))
+
+    Raises:
+        ValueError: If recipes are cyclic.
+    """
+    producers = catalog.get_producers()
+
+    # Topological order of all blueprints involved, by depth-first search (from an explicit stack, so recipe chains
+    # of any depth can be ordered)
+    deps = {}
+    topo = []
+    active = {}     # Sub-blueprints of the blueprints on the stack, to detect cycles
+
+    def visit(bp_name):
+        stack = [bp_name]
+        while stack:
+            name = stack[-1]
+            if name in deps:
+                stack.pop()
+            elif name not in active:
+                # Order sub-blueprints first, in order of the recipe
+                subs = [producers[mat][0] for cost in catalog.get(name).direct_cost() for mat in cost
+                        if mat in producers]
+                for sub_bp in subs:
+                    if sub_bp in active:
+                        raise ValueError('Cyclic recipe detected for blueprint {}!'.format(sub_bp))
+                active[name] = set(subs)
+                stack.extend(sub_bp for sub_bp in reversed(subs) if sub_bp not in deps)
+            else:
+                deps[name] = active.pop(name)
+                topo.append(name)
+                stack.pop()
+
+    demand = {}
+    for bp_name, n in order:
+        visit(bp_name)
+        demand[bp_name] = demand.get(bp_name, 0) + n
+
+    # Propagate demand from the top down, rounding up to whole builds
+    builds = {}
+    for bp_name in reversed(topo):
+        builds[bp_name] = ceil(demand.get(bp_name, 0))
+        for cost in catalog.get(bp_name).direct_cost():
+            for mat, n in cost.items():
+                if mat in producers:
+                    sub_bp, produced = producers[mat]
+                    demand[sub_bp] = demand.get(sub_bp, 0) + builds[bp_name] * n / produced
+
+    return builds, deps, topo
+
+
+def schedule_order(catalog, order, builders):
+    """
+    Schedules the builds of an order (including all sub-components) over several builders.
+    Builds of a blueprint are split evenly over the builders and can only start once all its sub-components
+    are finished. Parts on the longest remaining chain of work are scheduled first, each on the builder that
+    finishes it earliest.
+
+    Args:
+        catalog (BlueprintCatalog): Catalog of all blueprints.
+        order (iterable): Pairs of (blueprint name, number of builds).
+        builders (list): Workforce available at every builder (e.g. kit).
+
+    Returns:
+        dict: Schedule with keys
+            'makespan' (float): Hours until the entire order is finished.
+            'critical_path' (list): Chain of blueprints (sub-components first) determining the minimal duration.
+            'critical_path_hours' (float): Duration of the critical path, ignoring limited builders.
+            'builds' (dict): Number of builds per blueprint.
+            'jobs' (list): Tuples of (builder index, blueprint, builds, start hour, end hour), by start.
+    """
+    if not builders:
+        raise ValueError('At least one builder is required')
+    builds, deps, topo = expand_order(catalog, order)
+
+    def hours(bp_name, n, workforce):
+        """ Duration of n builds of a blueprint given the workforce of a builder. """
+        bp = catalog.get(bp_name)
+        if not n or not bp.manhours:
+            return 0.0
+        workers = min(workforce, bp.max_workforce) if bp.max_workforce else workforce
+        return n * bp.manhours / workers
+
+    # Split builds of every blueprint evenly over (at most) all builders
+    parts = {}
+    for bp_name in topo:
+        k = max(1, min(builds[bp_name], len(builders)))
+        parts[bp_name] = [builds[bp_name] // k + (1 if i < builds[bp_name] % k else 0) for i in range(k)]
+
+    # Longest chain up to (critical path) and from (priority) every blueprint, on the fastest builder
+    fastest = max(builders)
+    part_hours = {bp_name: hours(bp_name, parts[bp_name][0], fastest) for bp_name in topo}
+    path = {}
+    for bp_name in topo:
+        path[bp_name] = part_hours[bp_name] + max((path[sub] for sub in deps[bp_name]), default=0.0)
+    parents = {bp_name: [] for bp_name in topo}
+    for bp_name in topo:
+        for sub in deps[bp_name]:
+            parents[sub].append(bp_name)
+    rank = {}
+    for bp_name in reversed(topo):
+        rank[bp_name] = part_hours[bp_name] + max((rank[p] for p in parents[bp_name]), default=0.0)
+
+    # Critical path: follow the longest chain back from the last blueprint to finish
+    critical = [max(topo, key=lambda bp_name: path[bp_name])] if topo else []
+    while critical and deps[critical[-1]]:
+        critical.append(max(deps[critical[-1]], key=lambda sub: path[sub]))
+    critical.reverse()
+
+    # List scheduling of all parts
+    free = [0.0] * len(builders)
+    finish = {}
+    remaining = {bp_name: len(parts[bp_name]) for bp_name in topo}
+    waiting = {bp_name: len(deps[bp_name]) for bp_name in topo}
+    ready = []
+    jobs = []
+    sequence = count()  # Tie breaker, keeps parts in order of release
+
+    def release(bp_name, ready_time):
+        for n in parts[bp_name]:
+            heappush(ready, (-rank[bp_name], next(sequence), ready_time, bp_name, n))
+
+    for bp_name in topo:
+        if not waiting[bp_name]:
+            release(bp_name, 0.0)
+    while ready:
+        _, _, ready_time, bp_name, n = heappop(ready)
+        # Builder finishing this part earliest
+        end, b = min((max(free[b], ready_time) + hours(bp_name, n, builders[b]), b) for b in range(len(builders)))
+        start = end - hours(bp_name, n, builders[b])
+        free[b] = end
+        jobs.append((b, bp_name, n, start, end))
+        finish[bp_name] = max(finish.get(bp_name, 0.0), end)
+        remaining[bp_name] -= 1
+        if not remaining[bp_name]:
+            # All parts scheduled, parents may become ready
+            for p in parents[bp_name]:
+                waiting[p] -= 1
+                if not waiting[p]:
+                    release(p, max(finish[sub] for sub in deps[p]))
+
+    jobs.sort(key=lambda job: (job[3], job[0]))
+    return {'makespan': max(finish.values(), default=0.0),
+            'critical_path': critical,
+            'critical_path_hours': path[critical[-1]] if critical else 0.0,
+            'builds': builds,
+            'jobs': jobs}
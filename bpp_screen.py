@@ -1,13 +1,20 @@
 # Make display locale aware
 import locale
+from math import ceil
 
 # Kivy stuff
-from kivy.uix.tabbedpanel import TabbedPanel
+from kivy.properties import StringProperty
+from kivy.uix.behaviors import ButtonBehavior
+from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.uix.tabbedpanel import TabbedPanel
+from kivy.uix.textinput import TextInput
 
 
-class BpDropButton(Button):
-    """Special button for a blueprint in the blueprint dropdown menu."""
+class BpListButton(Button):
+    """Special button for a blueprint in the (recycled) blueprint list."""
+    bp_name = StringProperty('')    # Blueprint of the button, its text may contain more
 
     def __init__(self, **kwargs):
         """
@@ -16,6 +23,75 @@ class BpDropButton(Button):
         super().__init__(**kwargs)
 
 
+class BpTableRow(ButtonBehavior, BoxLayout):
+    """Row of the (recycled) blueprint table, selecting its blueprint when pressed."""
+    bp_name = StringProperty('')
+    tech = StringProperty('')
+    source = StringProperty('')
+    manhours = StringProperty('')
+
+
+class KitPanel(BoxLayout):
+    """Calculator of a kit type, with an amount input for every module of the kit (as found in the database)."""
+    kit = StringProperty('')
+
+    def __init__(self, **kwargs):
+        """
+        Prepare (empty) module inputs.
+        """
+        super().__init__(**kwargs)
+        self.inputs = {}
+
+    def show_modules(self, modules):
+        """
+        Creates an amount input for every module of the kit.
+
+        Args:
+            modules (list): Names of all modules that can be equipped on the kit.
+        """
+        grid = self.ids['modules']
+        grid.clear_widgets()
+        self.inputs = {}
+        for name in modules:
+            grid.add_widget(Label(text=name))
+            self.inputs[name] = TextInput(multiline=False, hint_text='#', input_filter='int',
+                                          size_hint_y=None, height=32)
+            grid.add_widget(self.inputs[name])
+
+    def get_modules(self):
+        """
+        Returns:
+            dict: Number of every module as filled in (empty inputs are left out).
+        """
+        return {name: int(field.text) for name, field in self.inputs.items() if field.text}
+
+    def show_setup(self, setup):
+        """
+        Displays a kit setup.
+
+        Args:
+            setup (ModuleSetup): Calculated kit setup.
+        """
+        res = "Workforce:\n"
+        res += f"  Workers: {setup.workers}\n"
+        res += f"  Hydros: {setup.hydros}\n"
+        res += f"  MREs: {setup.mres}\n"
+        res += f"  Credits/month: {setup.credits_per_month / 1000000 :.1f}m\n"
+        res += "Per day:\n"
+        lines = [f"  {commod.capitalize()}: {round(n):+n}" for commod, n in setup.flows.items()]
+        res += "\n".join(sorted(lines))
+        self.ids['kit_info'].text = res
+
+    def show_error(self, message):
+        """
+        Displays why a setup could not be calculated.
+
+        Args:
+            message (str): Error message.
+        """
+        self.ids['kit_info'].text = message
+
+
 class BppScreen(TabbedPanel):
     """
     Class handling all graphical interactions.
@@ -23,59 +99,109 @@ class BppScreen(TabbedPanel):
 
     def __init__(self, **kwargs):
         """
-        Initialise with a (temporary) dictionary that holds the cost
-        of producing one of the currently selected blueprint.
+        Initialise locale aware display.
 
         Args:
             **kwargs:
         """
         super().__init__(**kwargs)
         locale.setlocale(locale.LC_ALL, '')     # Autodetect and set locale
-        self.cost_dict = {}
 
-    def populate_dropdown(self, bp_list):
+    def show_blueprints(self, bp_list):
         """
-        Adds all given blueprints as buttons to the dropdown menu.
+        Shows given blueprints in the blueprint list. Buttons are only created for visible blueprints.
 
         Args:
-            bp_list (list): All blueprint names in the database.
+            bp_list (list): Blueprint names to show.
         """
-        # Loop through blueprints and add each as button
-        for bp in bp_list:
-            # Construct button
-            bp_btn = BpDropButton(text=bp)
-            bp_btn.bind(on_release=lambda btn: self.ids['bp_drop'].select(btn.text))
-            # Add button to dropdown list
-            self.ids['bp_drop'].add_widget(bp_btn)
+        self.ids['bp_list'].data = [{'text': bp, 'bp_name': bp} for bp in bp_list]
 
-    def update_cost_dict(self, new_cost):
+    def get_browse_filters(self):
+        """
+        Returns:
+            dict: Filters of the blueprint table as filled in (see BppLogic.browse_blueprints), empty ones left out.
         """
+        filters = {}
+        if self.ids['browse_text'].text.strip():
+            filters['text'] = self.ids['browse_text'].text.strip()
+        if self.ids['browse_material'].text.strip():
+            filters['material'] = self.ids['browse_material'].text.strip()
+        if self.ids['browse_source'].text in self.ids['browse_source'].values[1:]:
+            filters['source'] = self.ids['browse_source'].text
+        if self.ids['browse_tech_min'].text:
+            filters['tech_min'] = int(self.ids['browse_tech_min'].text)
+        if self.ids['browse_tech_max'].text:
+            filters['tech_max'] = int(self.ids['browse_tech_max'].text)
+        return filters
+
+    def set_sources(self, sources):
+        """
+        Fills the source filter of the blueprint table.
 
         Args:
-            new_cost:
+            sources (list): All sources of blueprints.
+        """
+        self.ids['browse_source'].values = ['All sources'] + sources
 
-        Returns:
+    def show_blueprint_page(self, rows, total, append=False):
+        """
+        Shows a page of the blueprint table. Only widgets for visible rows are created.
+
+        Args:
+            rows (list): Blueprints as dictionaries (see BppLogic.browse_blueprints).
+            total (int): Number of blueprints matching the filters.
+            append (bool): Whether to add the rows to those already shown, instead of replacing them.
+        """
+        data = [{'bp_name': row['blueprint'],
+                 'tech': '' if row['tech'] is None else str(row['tech']),
+                 'source': row['source'] or '',
+                 'manhours': '' if row['manhours'] is None else f"{row['manhours']:n}"} for row in rows]
+        table = self.ids['bp_table']
+        table.data = table.data + data if append else data
+        self.ids['browse_count'].text = '{} of {} blueprints'.format(len(table.data), total)
+
+    def show_where_used(self, used):
+        """
+        Shows the blueprints requiring a material in the where-used list.
+
+        Args:
+            used (list): Pairs of (blueprint name, depth), see BppLogic.where_used.
+        """
+        self.ids['used_list'].data = [{'text': bp if depth == 1 else '{} (level {})'.format(bp, depth), 'bp_name': bp}
+                                      for bp, depth in used]
 
+    def select_blueprint(self, bp_name):
         """
-        self.cost_dict = new_cost
-        # Also display costs
-        self.update_cost(1)
+        Marks a blueprint as selected.
 
-    def update_cost(self, number):
+        Args:
+            bp_name (str): Name of the selected blueprint.
+        """
+        self.ids['bp_selected'].text = bp_name
+
+    def get_build_amount(self):
+        """
+        Returns:
+            int: Amount of products that need to be built, as filled in (1 if empty).
         """
-        Updates the material cost summary display, based on a given desired amount.
+        text = self.ids['build_n'].text
+        return int(text) if text else 1
+
+    def update_cost(self, cost):
+        """
+        Updates the material cost summary display.
 
         Args:
-            number (int): Amount of products that need to be built.
+            cost (dict): Basic commodities required for the desired amount (empty if no blueprint is selected).
 
         Returns:
 
         """
-        # Only calculate if base materials are known
-        if self.cost_dict:
-            # Construct summary string
+        # Only display if base materials are known
+        if cost:
+            # Construct summary string, rounding partial (discounted) materials up
             mat_sum = 'Summary of required materials:'
-            mat_sum += ''.join(['\n' + f'{number * n:n}' + ' ' + mat for mat, n in self.cost_dict.items()])
+            mat_sum += ''.join(['\n' + f'{ceil(n):n}' + ' ' + mat for mat, n in cost.items()])
             # Display constructed summary
             self.ids['build_info'].text = mat_sum
         else:
@@ -84,13 +210,81 @@ class BppScreen(TabbedPanel):
 
     def update_setup(self, setup):
         """
-        Updates the material cost summary display, based on a given desired amount.
+        Displays an ExE kit setup.
 
         Args:
-            setup (str): String of optimal ExE kit setup
+            setup (ExeSetup): Calculated ExE kit setup, or None if the kit tech is too low.
+        """
+        if setup is None:
+            self.ids['exe_info'].text = 'Base tech is too low!'
+            return
 
-        Returns:
+        # Construct summary
+        res = "Workforce:\n"
+        res += f"  Workers: {setup.workers}\n"
+        res += f"  Hydros: {setup.hydros}\n"
+        res += f"  MREs: {setup.mres}\n"
+        res += f"  Credits/month: {setup.credits_per_month / 1000000 :.1f}m\n"
+        res += "Factories:\n"
+        lines = [f"  {setup.factory_names[commod]}: {n}" for commod, n in setup.factories.items()]
+        res += "\n".join(sorted(lines)) + '\n'
+        res += f"Extractors (tech {setup.tech}):\n"
+        lines = [f"  {commod.capitalize()}: {n}" for commod, n in setup.slots.items()]
+        res += "\n".join(sorted(lines))
+        # Display constructed summary
+        self.ids['exe_info'].text = res
 
+    def update_optimised_setups(self, setups, limit=10, sort_by='output_per_worker'):
         """
-        # Display constructed summary
-        self.ids['exe_info'].text = setup
+        Displays the best ExE kit setups found by the optimiser.
+
+        Args:
+            setups (list): Setups (ExeSetup), best first.
+            limit (int): Maximum number of setups to display.
+            sort_by (str): Ranking of the setups, 'output_per_worker' or 'credits'.
+        """
+        if not setups:
+            self.ids['exe_info'].text = 'No setup possible, check tech level, slots and maximum workers.'
+            return
+
+        ranking = 'lowest credits/month' if sort_by == 'credits' else 'output per worker'
+        lines = ['Best setups (of {}), by {}:'.format(len(setups), ranking)]
+        for i, setup in enumerate(setups[:limit], 1):
+            lines.append(f"{i}. {round(setup.output_per_worker):n} commodities per worker per day")
+            lines.append(f"  Workers: {setup.workers}, Hydros: {setup.hydros}, MREs: {setup.mres}")
+            lines.append(f"  Credits/month: {setup.credits_per_month / 1000000 :.1f}m")
+            lines.append('  Extractors (tech {}): '.format(setup.tech)
+                         + ', '.join(f'{commod.capitalize()}: {n}' for commod, n in sorted(setup.slots.items())))
+        self.ids['exe_info'].text = '\n'.join(lines)
+
+    def update_db_version(self, version, message):
+        """
+        Displays the database version and the outcome of checking for database updates.
+
+        Args:
+            version (str): Current database version.
+            message (str): Outcome of the check.
+        """
+        self.ids['db_version'].text = 'Database version ' + str(version)
+        self.ids['db_update_info'].text = message
+
+    def update_statistics(self, summary, limit=15):
+        """
+        Displays collected timings and cache hit ratios.
+
+        Args:
+            summary (dict): Summary of the instrumentation (see Instrumentation.summary).
+            limit (int): Maximum number of timings to display.
+        """
+        if not summary['timings'] and not summary['caches']:
+            self.ids['stats_info'].text = 'Nothing collected yet.'
+            return
+
+        lines = ['Slowest (total of {} kinds of calls and queries):'.format(len(summary['timings']))]
+        for timing in summary['timings'][:limit]:
+            lines.append(f"  {timing['total'] * 1000:.1f} ms in {timing['count']}x ({timing['mean'] * 1000:.2f} ms avg)"
+                         f" {timing['kind']}: {timing['name']}")
+        lines.append('Cache hits:')
+        for name, cache in sorted(summary['caches'].items()):
+            lines.append(f"  {name}: {cache['ratio']:.0%} of {cache['hits'] + cache['misses']}")
+        self.ids['stats_info'].text = '\n'.join(lines)
@@ -0,0 +1,100 @@
+from bisect import bisect_left
+from collections import defaultdict
+from re import finditer
+
+
+def trigrams(text):
+    """
+    Splits a text into its (overlapping) sequences of three characters.
+
+    Args:
+        text (str): Text to split.
+
+    Returns:
+        set: All trigrams in the text (empty if the text is shorter than three characters).
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameIndex:
+    """
+    Search index over names, built once. Names are matched by prefix first, then by the start of any of their words,
+    and finally (fuzzy) by the number of trigrams they share with the query.
+    """
+
+    def __init__(self, names):
+        """
+        Builds the index.
+
+        Args:
+            names (iterable): Names to index, in their default order.
+        """
+        self.names = list(names)
+        lower = [name.lower() for name in self.names]
+        # Sorted keys for prefix search by bisection, with positions of the corresponding names
+        self.prefixes = sorted((key, i) for i, key in enumerate(lower))
+        self.prefix_keys = [key for key, _ in self.prefixes]
+        # Same for every word within a name (the remainder of the name from the start of the word)
+        self.words = sorted((key[m.start():], i) for i, key in enumerate(lower) for m in finditer(r'\b\w', key))
+        self.word_keys = [key for key, _ in self.words]
+        # Names containing each trigram
+        self.trigrams = defaultdict(list)
+        for i, key in enumerate(lower):
+            for tri in trigrams(key):
+                self.trigrams[tri].append(i)
+
+    @staticmethod
+    def _prefix_matches(keys, entries, query):
+        """
+        Args:
+            keys (list): Sorted keys.
+            entries (list): Tuples of (key, position) corresponding to the keys.
+            query (str): Lowercase prefix to find.
+
+        Returns:
+            iterator: Positions of names whose key starts with the query, in alphabetical order.
+        """
+        for j in range(bisect_left(keys, query), len(keys)):
+            if not keys[j].startswith(query):
+                break
+            yield entries[j][1]
+
+    def search(self, query, limit=None):
+        """
+        Finds names matching a query, best matches first.
+
+        Args:
+            query (str): (Part of) the name to look for, case insensitive.
+            limit (int, optional): Maximum number of names to return.
+
+        Returns:
+            list: Matching names.
+        """
+        query = query.strip().lower()
+        if not query:
+            return self.names[:limit]
+
+        found = []
+        seen = set()
+        # Prefixes of the entire name, then prefixes of words within the name
+        for keys, entries in ((self.prefix_keys, self.prefixes), (self.word_keys, self.words)):
+            for i in self._prefix_matches(keys, entries, query):
+                if i not in seen:
+                    seen.add(i)
+                    found.append(i)
+                    if limit is not None and len(found) >= limit:
+                        return [self.names[i] for i in found]
+
+        # Fuzzy matches sharing at least half of the trigrams of the query
+        query_tris = trigrams(query)
+        if query_tris:
+            hits = defaultdict(int)
+            for tri in query_tris:
+                for i in self.trigrams.get(tri, ()):
+                    hits[i] += 1
+            needed = (len(query_tris) + 1) // 2
+            fuzzy = sorted((i for i, n in hits.items() if n >= needed and i not in seen),
+                           key=lambda i: (-hits[i], self.names[i]))
+            found.extend(fuzzy)
+
+        return [self.names[i] for i in found[:limit]]
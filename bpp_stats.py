@@ -0,0 +1,150 @@
+# Standard library stuff
+from collections import deque
+from functools import wraps
+from json import dumps
+from threading import Lock
+from time import perf_counter, time
+
+
+class Instrumentation:
+    """
+    Opt-in collection of timings (of database queries and calculations) and cache hits.
+    Events are kept in a ring buffer, so only the most recent ones are retained and memory use is bounded.
+    While disabled, instrumented code only checks the enabled flag.
+    """
+
+    def __init__(self, capacity=2000):
+        """
+        Args:
+            capacity (int): Number of events kept in the ring buffer.
+        """
+        self.enabled = False
+        self.events = deque(maxlen=capacity)
+        # Hits and misses per cache
+        self.caches = {}
+        self.lock = Lock()
+
+    def enable(self, capacity=None):
+        """
+        Starts collecting events.
+
+        Args:
+            capacity (int, optional): New size of the ring buffer (keeps the current size if not given).
+        """
+        if capacity is not None and capacity != self.events.maxlen:
+            self.events = deque(self.events, maxlen=capacity)
+        self.enabled = True
+
+    def disable(self):
+        """ Stops collecting events, collected events are kept. """
+        self.enabled = False
+
+    def clear(self):
+        """ Discards all collected events and cache counts. """
+        self.events.clear()
+        with self.lock:
+            self.caches = {}
+
+    def record(self, kind, name, seconds, rows=None):
+        """
+        Adds an event to the ring buffer.
+
+        Args:
+            kind (str): Kind of event, e.g. 'query' or 'call'.
+            name (str): What was timed (query or function).
+            seconds (float): Duration.
+            rows (int, optional): Number of rows returned or changed (queries only).
+
+        Returns:
+            list: The event ([timestamp, kind, name, seconds, rows]), which may be completed later on.
+        """
+        event = [time(), kind, name, seconds, rows]
+        self.events.append(event)   # Appending to a deque is thread-safe
+        return event
+
+    def cache(self, name, hit):
+        """
+        Counts a cache lookup.
+
+        Args:
+            name (str): Name of the cache.
+            hit (bool): Whether the value was found in the cache.
+        """
+        with self.lock:
+            counts = self.caches.setdefault(name, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def summary(self):
+        """
+        Aggregates the collected events.
+
+        Returns:
+            dict: 'timings' with count, total, mean and max seconds (and rows) per kind and name, slowest total first,
+                and 'caches' with hits, misses and hit ratio per cache.
+        """
+        timings = {}
+        for _, kind, name, seconds, rows in list(self.events):
+            timing = timings.setdefault((kind, name), {'kind': kind, 'name': name, 'count': 0, 'total': 0.0,
+                                                       'max': 0.0, 'rows': 0})
+            timing['count'] += 1
+            timing['total'] += seconds
+            timing['max'] = max(timing['max'], seconds)
+            timing['rows'] += rows or 0
+        for timing in timings.values():
+            timing['mean'] = timing['total'] / timing['count']
+
+        with self.lock:
+            caches = {name: {'hits': hits, 'misses': misses, 'ratio': hits / (hits + misses)}
+                      for name, (hits, misses) in self.caches.items()}
+        return {'timings': sorted(timings.values(), key=lambda timing: -timing['total']),
+                'caches': caches}
+
+    def to_json(self, indent=None):
+        """
+        Args:
+            indent (int, optional): Indentation of the JSON.
+
+        Returns:
+            str: Summary and all events in the ring buffer as JSON.
+        """
+        events = [{'timestamp': timestamp, 'kind': kind, 'name': name, 'seconds': seconds, 'rows': rows}
+                  for timestamp, kind, name, seconds, rows in list(self.events)]
+        return dumps(dict(self.summary(), events=events), indent=indent)
+
+    def export(self, file_name):
+        """
+        Writes the summary and all events to a JSON file.
+
+        Args:
+            file_name (str): Location of the file.
+        """
+        with open(file_name, 'w') as f:
+            f.write(self.to_json(indent=2))
+
+
+# Instrumentation shared by the entire application (all threads)
+stats = Instrumentation()
+
+
+def instrumented(func):
+    """
+    Decorator recording the duration of every call of a function while instrumentation is enabled.
+
+    Args:
+        func (callable): Function to time.
+
+    Returns:
+        callable: Timed function.
+    """
+    name = func.__qualname__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not stats.enabled:
+            return func(*args, **kwargs)
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.record('call', name, perf_counter() - start)
+    return wrapper
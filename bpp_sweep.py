@@ -0,0 +1,112 @@
+# Optional dependency, only needed for parameter sweeps
+import numpy as np
+
+# Standard library stuff
+from csv import writer
+
+# Columns of a sweep table
+SWEEP_COLUMNS = ('tech', 'ee', 'commodity', 'slots', 'output', 'factory', 'factories',
+                 'workers', 'hydros', 'mres', 'credits_per_month')
+
+
+def sweep_exe(kits, techs=None, ee_levels=range(31), max_slots=30):
+    """
+    Evaluates the ExE kit setups of a single commodity over a whole grid of extractor techs, Extraction Expert levels
+    and slot counts, as arrays instead of one setup at a time. Results are identical to KitSetup.exe_setup.
+
+    Args:
+        kits (KitSetup): Kit setup module providing extractor and factory stats.
+        techs (iterable, optional): Extractor tech levels (defaults to all in kits.extractor_techs).
+        ee_levels (iterable): Extraction Expert levels.
+        max_slots (int): Highest number of slots, every count from 1 up to it is evaluated.
+
+    Yields:
+        dict: Chunk of the table per extractor tech, with an array per column (see SWEEP_COLUMNS).
+    """
+    if techs is None:
+        techs = kits.extractor_techs
+    ee = np.asarray(ee_levels, dtype=np.int64)
+    slots = np.arange(1, max_slots + 1, dtype=np.int64)
+    # Grid of (commodity, EE level, slots), flattened in that order
+    n_commods = len(kits.COMMODS)
+    grid_commod = np.repeat(np.arange(n_commods), len(ee) * len(slots))
+    grid_ee = np.tile(np.repeat(ee, len(slots)), n_commods)
+    grid_slots = np.tile(slots, n_commods * len(ee))
+    # Same order of operations as KitSetup.factories_needed, so rounding matches exactly
+    bonus = 1 + kits.ee_lvl_bonus * grid_ee
+    conversion = np.array([kits.FACTORY_STATS[commod]["conversion_rate"] for commod in kits.COMMODS])[grid_commod]
+    ext_workers = np.array([kits.EXTRACTOR_STATS[commod]["workers_to_equip"] for commod in kits.COMMODS])[grid_commod]
+    fac_workers = np.array([kits.FACTORY_STATS[commod]["workers_to_equip"] for commod in kits.COMMODS])[grid_commod]
+    names = np.array(kits.COMMODS)[grid_commod]
+    factory_names = np.array([kits.FACTORY_STATS[commod]["name"] for commod in kits.COMMODS])[grid_commod]
+
+    for tech in techs:
+        rate = np.array([kits.EXTRACTOR_STATS[commod]["extraction_rate"][tech] for commod in kits.COMMODS])[grid_commod]
+        output = grid_slots * rate * bonus
+        factories = np.ceil(output / kits.MINUTES_PER_DAY / conversion).astype(np.int64)
+        # Few distinct workforces remain, so solve hydros and MREs once per workforce
+        base = kits.base_workers + ext_workers * grid_slots + fac_workers * factories
+        unique, inverse = np.unique(base, return_inverse=True)
+        solved = np.array([kits.supported_workforce(int(workers)) for workers in unique], dtype=np.int64)
+        workers, hydros, mres = solved[inverse.reshape(-1)].T
+        yield {'tech': np.full(len(grid_slots), tech),
+               'ee': grid_ee,
+               'commodity': names,
+               'slots': grid_slots,
+               'output': output,
+               'factory': factory_names,
+               'factories': factories,
+               'workers': workers,
+               'hydros': hydros,
+               'mres': mres,
+               'credits_per_month': kits.mre_creds_per_day(mres) * 30}
+
+
+def write_csv(file_name, chunks):
+    """
+    Streams a sweep table to a CSV file, chunk by chunk.
+
+    Args:
+        file_name (str): Location of the CSV file.
+        chunks (iterable): Chunks of the table (see sweep_exe).
+
+    Returns:
+        int: Number of rows written.
+    """
+    rows = 0
+    with open(file_name, 'w', newline='') as f:
+        out = writer(f)
+        out.writerow(SWEEP_COLUMNS)
+        for chunk in chunks:
+            out.writerows(zip(*(chunk[col].tolist() for col in SWEEP_COLUMNS)))
+            rows += len(chunk['tech'])
+    return rows
+
+
+def write_parquet(file_name, chunks):
+    """
+    Streams a sweep table to a Parquet file, one row group per chunk (requires pyarrow).
+
+    Args:
+        file_name (str): Location of the Parquet file.
+        chunks (iterable): Chunks of the table (see sweep_exe).
+
+    Returns:
+        int: Number of rows written.
+    """
+    import pyarrow as pa   # Optional dependency, only needed for Parquet output
+    import pyarrow.parquet as pq
+
+    rows = 0
+    out = None
+    try:
+        for chunk in chunks:
+            table = pa.table({col: chunk[col] for col in SWEEP_COLUMNS})
+            if out is None:
+                out = pq.ParquetWriter(file_name, table.schema)
+            out.write_table(table)
+            rows += table.num_rows
+    finally:
+        if out is not None:
+            out.close()
+    return rows
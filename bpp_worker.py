@@ -0,0 +1,115 @@
+# Standard library stuff
+from itertools import count
+from queue import Queue
+from threading import Lock, Thread
+
+
+class CalculationWorker:
+    """
+    Performs calculations on a background thread, so the UI stays responsive during long calculations.
+    Jobs run on the logic module of the app, under its lock, so they see every change made through it. The database
+    gives the worker thread its own connection.
+
+    Every job has a key; a new job supersedes all earlier jobs with the same key. Superseded jobs are skipped if
+    they have not started yet, and results of superseded jobs that were already running are discarded.
+    """
+
+    def __init__(self, logic, post=None):
+        """
+        Args:
+            logic (BppLogic): Logic module to perform the calculations with.
+            post (callable, optional): Function taking a callback and its argument, which calls the callback on the
+                thread that should receive results (e.g. through Clock.schedule_once).
+                Defaults to calling it directly on the worker thread.
+        """
+        self.logic = logic
+        self.post = post if post is not None else lambda callback, result: callback(result)
+        self.jobs = Queue()
+        # Latest job number per key, any other job with the same key is superseded
+        self.latest = {}
+        self.lock = Lock()
+        self.numbers = count(1)
+        self.thread = Thread(target=self.run, name='bpp-worker', daemon=True)
+
+    def start(self):
+        """ Starts the worker thread. """
+        self.thread.start()
+
+    def submit(self, key, method, args=(), kwargs=None, callback=None, error_callback=None):
+        """
+        Queues a calculation, superseding earlier calculations with the same key.
+
+        Args:
+            key (str): Kind of calculation, e.g. the display it updates.
+            method (str): Name of the BppLogic method to call.
+            args (tuple): Positional arguments of the method.
+            kwargs (dict, optional): Keyword arguments of the method.
+            callback (callable, optional): Receives the result (posted, see __init__).
+            error_callback (callable, optional): Receives the exception if the calculation fails (posted as well).
+
+        Returns:
+            int: Number of the job.
+        """
+        with self.lock:
+            number = next(self.numbers)
+            self.latest[key] = number
+        self.jobs.put((key, number, method, args, kwargs or {}, callback, error_callback))
+        return number
+
+    def cancel(self, key):
+        """
+        Cancels all calculations with a key (pending ones are skipped, results of a running one are discarded).
+
+        Args:
+            key (str): Kind of calculation.
+        """
+        with self.lock:
+            self.latest[key] = next(self.numbers)
+
+    def is_current(self, key, number):
+        """
+        Args:
+            key (str): Kind of calculation.
+            number (int): Number of the job.
+
+        Returns:
+            bool: Whether the job has not been superseded or cancelled.
+        """
+        with self.lock:
+            return self.latest.get(key) == number
+
+    def run(self):
+        """ Performs queued jobs until stopped (runs on the worker thread). """
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            key, number, method, args, kwargs, callback, error_callback = job
+            if not self.is_current(key, number):
+                continue
+            try:
+                # Caches of the logic module are not thread-safe, so calculate while nothing changes them
+                with self.logic.lock:
+                    result = getattr(self.logic, method)(*args, **kwargs)
+            except Exception as e:
+                if error_callback is not None and self.is_current(key, number):
+                    self.post(error_callback, e)
+                elif error_callback is None:
+                    print('Calculation {} failed: {}'.format(method, e))
+                continue
+            if callback is not None and self.is_current(key, number):
+                self.post(callback, result)
+
+    def stop(self, timeout=5):
+        """
+        Stops the worker thread after its current job, skipping all pending jobs.
+
+        Args:
+            timeout (float): Seconds to wait for the current job to finish.
+        """
+        with self.lock:
+            # Supersede everything still queued
+            self.latest.clear()
+        self.jobs.put(None)
+        if self.thread.is_alive():
+            self.thread.join(timeout)
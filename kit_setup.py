@@ -1,5 +1,111 @@
+# Project stuff
+from bpp_stats import stats
+
+# Standard library stuff
 from math import ceil
 
+# Steps after which a workforce is considered not to stabilise (the largest stable workforces take about 70)
+MAX_WORKFORCE_STEPS = 1000
+
+
+class ExeSetup:
+    """
+    Result of an ExE kit setup calculation.
+    """
+    __slots__ = ('tech', 'slots', 'factories', 'factory_names', 'workers', 'hydros', 'mres',
+                 'credits_per_month', 'output')
+
+    def __init__(self, tech, slots, factories, factory_names, workers, hydros, mres, credits_per_month, output):
+        """
+        Args:
+            tech (int): Tech level of equipped extractors.
+            slots (dict): Extractors (slots used) per commodity.
+            factories (dict): IC factories per commodity.
+            factory_names (dict): Name of the IC factory of every commodity with factories.
+            workers (int): Workers needed.
+            hydros (int): Hydroponics needed.
+            mres (int): MRE factories needed.
+            credits_per_month (float): Credits consumed by MRE factories per month.
+            output (float): Commodities extracted per day.
+        """
+        self.tech = tech
+        self.slots = slots
+        self.factories = factories
+        self.factory_names = factory_names
+        self.workers = workers
+        self.hydros = hydros
+        self.mres = mres
+        self.credits_per_month = credits_per_month
+        self.output = output
+
+    @property
+    def output_per_worker(self):
+        """
+        Returns:
+            float: Commodities extracted per worker per day.
+        """
+        return self.output / self.workers
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: All fields of the setup (including output per worker), e.g. for serialisation.
+        """
+        setup = {field: getattr(self, field) for field in self.__slots__}
+        setup['output_per_worker'] = self.output_per_worker
+        return setup
+
+    def __eq__(self, other):
+        if not isinstance(other, ExeSetup):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __repr__(self):
+        return 'ExeSetup({})'.format(', '.join(f'{field}={getattr(self, field)!r}' for field in self.__slots__))
+
+
+class ModuleSetup:
+    """
+    Result of a kit setup calculation with given numbers of modules (any type of kit).
+    """
+    __slots__ = ('kit', 'tech', 'modules', 'workers', 'hydros', 'mres', 'credits_per_month', 'flows')
+
+    def __init__(self, kit, tech, modules, workers, hydros, mres, credits_per_month, flows):
+        """
+        Args:
+            kit (str): Type of kit.
+            tech (int): Kit tech level.
+            modules (dict): Number of every equipped module.
+            workers (int): Workers needed.
+            hydros (int): Hydroponics needed.
+            mres (int): MRE factories needed.
+            credits_per_month (float): Credits consumed by MRE factories per month.
+            flows (dict): Commodities produced (positive) or consumed (negative) by the modules per day.
+        """
+        self.kit = kit
+        self.tech = tech
+        self.modules = modules
+        self.workers = workers
+        self.hydros = hydros
+        self.mres = mres
+        self.credits_per_month = credits_per_month
+        self.flows = flows
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: All fields of the setup, e.g. for serialisation.
+        """
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __eq__(self, other):
+        if not isinstance(other, ModuleSetup):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __repr__(self):
+        return 'ModuleSetup({})'.format(', '.join(f'{field}={getattr(self, field)!r}' for field in self.__slots__))
+
 
 class KitSetup:
     """
@@ -14,31 +120,120 @@ class KitSetup:
         self.db = db    # Store database module
         self.ee_lvl_bonus = float(self.db.get_variable('exe_level_bonus'))
         self.rat_cons = float(self.db.get_variable('worker_ration_consumption'))
+        # Initial workforce of every kit (for shield, trading bay etc.)
+        self.base_workers = int(self.db.get_variable('kit_base_workers', 40))
+        # Solved workforces (workers, hydros, MREs) by workers needed for everything else
+        self.workforce_cache = {}
+        # Calculated setups by (kit tech, EE level, slots)
+        self.setup_cache = {}
 
         # Some constants
         self.MINUTES_PER_DAY = 24 * 60
         self.COMMODS = ("metals", "nuclear waste", "silicon", "space oats", "baobabs")
 
-        # Additional extractor info
-        self.extractor_techs = (12, 14, 16, 18, 20)
-        self.EXTRACTOR_STATS = {   # Fusion extractor rates by tech (per day)
-            "metals": {"extraction_rate": {12: 21600, 14: 28080, 16: 34560, 18: 43200, 20: 51840}},
-            "nuclear waste": {"extraction_rate": {12: 6480, 14: 8424, 16: 10386, 18: 12960, 20: 15552}},
-            "silicon": {"extraction_rate": {12: 21600, 14: 28080, 16: 34560, 18: 43200, 20: 51840}},
-            "space oats": {"extraction_rate": {12: 21600, 14: 28080, 16: 34560, 18: 43200, 20: 51840}},
-            "baobabs": {"extraction_rate": {12: 21600, 14: 28080, 16: 34560, 18: 43200, 20: 51840}}
-        }
-        self.FACTORY_STATS = {
-            "metals": {"name": "Steel Foundry", "conversion_rate": 1000},
-            "nuclear waste": {"name": "Star Bottling Plant", "conversion_rate": 300},
-            "silicon": {"name": "Sentient Machine Learning Institute", "conversion_rate": 500},
-            "space oats": {"name": "Giant Space Still", "conversion_rate": 350},
-            "baobabs": {"name": "Figurine Workshop", "conversion_rate": 250},
-        }
-        for commod in self.COMMODS:
-            self.EXTRACTOR_STATS[commod]["workers_to_equip"] = 1     # All extractors take 1 worker to equip
-            self.FACTORY_STATS[commod]["workers_to_equip"] = 100     # All factories take 100 workers to equip
-        self.FACTORY_STATS["silicon"]["workers_to_equip"] = 50       # Except silicon
+        # Stats of all kit modules, loaded from the database
+        self.load_stats()
+
+    def load_stats(self):
+        """
+        (Re)loads the stats of all kit modules from the database and derives the ExE extractor and factory stats.
+        Cached setups are discarded, as they may no longer match.
+        """
+        self.modules = {}
+        for row in self.db.get_kit_modules():
+            # Modules per kit type, with the stats of every commodity and (extractor) tech level of a module
+            module = self.modules.setdefault(row['kit'], {}).setdefault(row['name'], [])
+            module.append(row)
+
+        self.EXTRACTOR_STATS = {commod: {"extraction_rate": {}} for commod in self.COMMODS}
+        self.FACTORY_STATS = {}
+        for rows in self.modules.get('exe', {}).values():
+            for row in rows:
+                if row['role'] == 'extractor':
+                    self.EXTRACTOR_STATS[row['commodity']]["extraction_rate"][row['tech']] = row['rate']
+                    self.EXTRACTOR_STATS[row['commodity']]["workers_to_equip"] = row['workers_to_equip']
+                elif row['role'] == 'factory':
+                    self.FACTORY_STATS[row['commodity']] = {"name": row['name'],
+                                                            "conversion_rate": row['rate'] / self.MINUTES_PER_DAY,
+                                                            "workers_to_equip": row['workers_to_equip']}
+        # Tech levels available for every commodity
+        self.extractor_techs = tuple(sorted(set.intersection(
+            *(set(stats["extraction_rate"]) for stats in self.EXTRACTOR_STATS.values()))))
+
+        self.setup_cache.clear()
+
+    def get_kits(self):
+        """
+        Returns:
+            list: Names of all kit types with known modules.
+        """
+        return list(self.modules)
+
+    def get_modules(self, kit):
+        """
+        Args:
+            kit (str): Type of kit.
+
+        Returns:
+            list: Names of all modules that can be equipped on the kit, in order of insertion.
+        """
+        return list(self.modules.get(kit, {}))
+
+    def module_stats(self, kit, base_tech):
+        """
+        Selects the stats of every module of a kit that can be equipped at a given kit tech.
+
+        Args:
+            kit (str): Type of kit.
+            base_tech (int): Kit tech level.
+
+        Returns:
+            dict: Rows of stats (one per commodity, of the highest available tech) by module name.
+        """
+        stats = {}
+        for name, rows in self.modules.get(kit, {}).items():
+            best = {}
+            for row in rows:
+                if row['tech'] <= base_tech and (row['commodity'] not in best
+                                                 or row['tech'] > best[row['commodity']]['tech']):
+                    best[row['commodity']] = row
+            if best:
+                stats[name] = list(best.values())
+        return stats
+
+    def kit_setup(self, kit, base_tech, counts):
+        """
+        Calculates the workforce and commodity flows of a kit with given numbers of modules equipped.
+        Works for every kit type in the database (e.g. production or colony kits).
+
+        Args:
+            kit (str): Type of kit.
+            base_tech (int): Kit tech level.
+            counts (dict): Number of every module (by name) to equip.
+
+        Returns:
+            ModuleSetup: Setup of the kit.
+
+        Raises:
+            ValueError: If a module is unknown or requires a higher kit tech, or the workforce cannot be supported.
+        """
+        stats = self.module_stats(kit, base_tech)
+        workers = self.base_workers
+        flows = {}
+        for name, n in counts.items():
+            if n <= 0:
+                continue
+            if name not in stats:
+                raise ValueError('Module {} cannot be equipped on a tech {} {} kit!'.format(name, base_tech, kit))
+            for row in stats[name]:
+                workers += row['workers_to_equip'] * n
+                # Factories convert (consume) commodities, everything else adds them
+                sign = -1 if row['role'] == 'factory' else 1
+                flows[row['commodity']] = flows.get(row['commodity'], 0) + sign * n * row['rate']
+
+        workers, hydros, mres = self.supported_workforce(workers)
+        return ModuleSetup(kit, base_tech, {name: n for name, n in counts.items() if n > 0}, workers, hydros, mres,
+                           self.mre_creds_per_day(mres) * 30, flows)
 
     def rations_per_hour(self, num_workers):
         """
@@ -122,30 +317,76 @@ class KitSetup:
 
         Returns:
             tuple: (Workers needed, hydroponics needed, MRE factories needed)
+
+        Raises:
+            ValueError: If the workforce cannot be supported (see solve_workforce).
         """
         # Include initial workforce (for shield, trading bay etc.)
-        workers = 40
+        workers = self.base_workers
         # Add workers needed to equip given extractors and factories
         for commod in self.COMMODS:
             workers += self.EXTRACTOR_STATS[commod]["workers_to_equip"] * extractors.get(commod, 0)
             workers += self.FACTORY_STATS[commod]["workers_to_equip"] * factories.get(commod, 0)
 
-        # Add workers for hydros and MREs until stable
+        return self.supported_workforce(workers)
+
+    def supported_workforce(self, workers):
+        """
+        Calculates how many hydroponics and MRE factories are needed to feed a workforce,
+        including the workers needed to equip those. Results are cached per workforce.
+
+        Args:
+            workers (int): Workers needed for everything but hydroponics and MRE factories.
+
+        Returns:
+            tuple: (Workers needed, hydroponics needed, MRE factories needed)
+
+        Raises:
+            ValueError: If the workforce cannot be supported (see solve_workforce).
+        """
+        solved = self.workforce_cache.get(workers)
+        if stats.enabled:
+            stats.cache('workforce', solved is not None)
+        if solved is None:
+            solved = self.workforce_cache[workers] = self.solve_workforce(workers)
+        return solved
+
+    def solve_workforce(self, workers):
+        """
+        Adds workers for hydroponics and MRE factories until the workforce is stable.
+        Large workforces never stabilise (every step adds enough workers to require more hydroponics or MREs),
+        so the number of steps is limited by MAX_WORKFORCE_STEPS.
+
+        Args:
+            workers (int): Workers needed for everything but hydroponics and MRE factories.
+
+        Returns:
+            tuple: (Workers needed, hydroponics needed, MRE factories needed)
+
+        Raises:
+            ValueError: If the workforce does not stabilise.
+        """
+        base = workers
         hydros = 0
         mres = 1
         workers += hydros + mres
-        h_new = self.hydros_needed(workers)
-        mre_new = self.mres_needed(workers)
-        while [hydros, mres] != [h_new, mre_new]:
+        # Hydros and MREs both follow from the rations consumed (see hydros_needed and mres_needed)
+        rations = self.rations_per_hour(workers)
+        h_new = ceil(rations * 2 / 360)
+        mre_new = ceil(rations / 300)
+        for _ in range(MAX_WORKFORCE_STEPS):
+            if hydros == h_new and mres == mre_new:
+                # Return total amount of workers, hydroponics and MRE factories required for the kit
+                return workers, hydros, mres
             # Not stable yet, calculate new workforce
             hydros = h_new
             mres = mre_new
             workers += hydros + mres
-            h_new = self.hydros_needed(workers)
-            mre_new = self.mres_needed(workers)
+            rations = self.rations_per_hour(workers)
+            h_new = ceil(rations * 2 / 360)
+            mre_new = ceil(rations / 300)
 
-        # Return total amount of workers, hydroponics and MRE factories required for the kit
-        return workers, hydros, mres
+        raise ValueError('A workforce of {} workers cannot be supported by hydroponics and MREs'.format(base))
 
     def factories_needed(self, extractor_tech, ee=30, slots=None):
         """
@@ -175,6 +416,21 @@ class KitSetup:
         return factories
 
     def exe_base_setup(self, base_tech, ee_level=30, metals=0, nukes=0, silicon=0, oats=0, baobabs=0):
+        """
+        Calculates the configuration of an ExE kit, given kit tech, Extraction Expert level and slots per commodity.
+
+        Args:
+            base_tech (int): Kit tech level for which setup is being calculated.
+            ee_level (int): Extraction Expert level of character holding the kit.
+            metals (int): Metals slots to use.
+            nukes (int): Nuclear Waste slots to use.
+            silicon (int): Silicon slots to use.
+            oats (int): Space Oats slots to use.
+            baobabs (int): Baobabs slots to use.
+
+        Returns:
+            ExeSetup: Setup of the kit, or None if the kit tech is too low for any extractor.
+        """
         slots = {}
         if metals > 0:
             slots["metals"] = metals
@@ -187,28 +443,127 @@ class KitSetup:
         if baobabs > 0:
             slots["baobabs"] = baobabs
 
+        return self.exe_setup(base_tech, ee_level, slots)
+
+    def exe_setup(self, base_tech, ee_level=30, slots=None):
+        """
+        Calculates the configuration of an ExE kit using all given extraction slots.
+        Results are cached, so they should not be modified.
+
+        Args:
+            base_tech (int): Kit tech level for which setup is being calculated.
+            ee_level (int): Extraction Expert level of character holding the kit.
+            slots (dict): Dictionary with slots to use per commodity.
+
+        Returns:
+            ExeSetup: Setup of the kit, or None if the kit tech is too low for any extractor.
+        """
+        if slots is None:
+            slots = {}
+        key = (base_tech, ee_level, tuple(sorted(slots.items())))
+        if stats.enabled:
+            stats.cache('exe_setup', key in self.setup_cache)
+        if key not in self.setup_cache:
+            tech = self.best_extractor_tech(base_tech)
+            if tech is None:
+                setup = None
+            else:
+                factories = self.factories_needed(tech, ee_level, slots)
+                setup = self.complete_setup(tech, ee_level, slots, factories,
+                                            *self.calculate_workforce(slots, factories))
+            self.setup_cache[key] = setup
+        return self.setup_cache[key]
+
+    def complete_setup(self, tech, ee_level, slots, factories, workers, hydros, mres):
+        """
+        Constructs the result of a setup calculation, adding factory names, credits and output.
+
+        Args:
+            tech (int): Tech level of equipped extractors.
+            ee_level (int): Extraction Expert level of character holding the kit.
+            slots (dict): Dictionary with slots used per commodity.
+            factories (dict): Dictionary of IC factories per commodity.
+            workers (int): Workers needed.
+            hydros (int): Hydroponics needed.
+            mres (int): MRE factories needed.
+
+        Returns:
+            ExeSetup: Setup of the kit.
+        """
+        output = sum(n * self.EXTRACTOR_STATS[commod]["extraction_rate"][tech] for commod, n in slots.items())\
+            * (1 + self.ee_lvl_bonus * ee_level)
+        return ExeSetup(tech, slots, factories, {commod: self.FACTORY_STATS[commod]["name"] for commod in factories},
+                        workers, hydros, mres, self.mre_creds_per_day(mres) * 30, output)
+
+    def optimise_exe_setup(self, base_tech, ee_level=30, max_slots=None, worker_cap=None, sort_by='output_per_worker'):
+        """
+        Searches all allocations of extraction slots for the Pareto-best ExE kit setups: no other setup
+        extracts more with the same or fewer workers.
+        As the workforce of a setup only depends on the workers needed to equip its extractors and factories,
+        the search keeps only the best allocation for every such workforce (dynamic programming over commodities).
+
+        Args:
+            base_tech (int): Kit tech level for which setups are being calculated.
+            ee_level (int): Extraction Expert level of character holding the kit.
+            max_slots (dict): Dictionary with maximum slots per commodity available on the celestial body.
+            worker_cap (int, optional): Maximum number of workers on the kit.
+            sort_by (str): Ranking of the setups, either 'output_per_worker' (highest first)
+                or 'credits' (lowest credits/month first).
+
+        Returns:
+            list: Setups (ExeSetup), best first.
+        """
+        if max_slots is None:
+            max_slots = {}
         tech = self.best_extractor_tech(base_tech)
         if tech is None:
-            return "Base tech is too low!"
-
-        factories = self.factories_needed(tech, ee_level, slots)
-        workers, hydros, mres = self.calculate_workforce(slots, factories)
-
-        # Construct result string
-        res = "Workforce:\n"
-        res += f"  Workers: {workers}\n"
-        res += f"  Hydros: {hydros}\n"
-        res += f"  MREs: {mres}\n"
-        res += f"  Credits/month: {self.mre_creds_per_day(mres) * 30 / 1000000 :.1f}m\n"
-        res += "Factories:\n"
-
-        lines = []
-        for commod in slots:
-            lines.append(f"  {self.FACTORY_STATS[commod]['name']}: {factories[commod]}")
-        res += "\n".join(sorted(lines)) + '\n'
-        res += f"Extractors (tech {tech}):\n"
-        lines = []
-        for commod in slots:
-            lines.append(f"  {commod.capitalize()}: {slots[commod]}")
-        res += "\n".join(sorted(lines))
-        return res
+            return []
+
+        # Best (output, slots) per number of workers, before hydros and MREs (starting with initial workforce)
+        states = {self.base_workers: (0, {})}
+        for commod in self.COMMODS:
+            if max_slots.get(commod, 0) <= 0:
+                continue
+            # Workers and output of every number of slots used for this commodity
+            options = []
+            for s in range(max_slots[commod] + 1):
+                factories = self.factories_needed(tech, ee_level, {commod: s}).get(commod, 0)
+                workers = self.EXTRACTOR_STATS[commod]["workers_to_equip"] * s\
+                    + self.FACTORY_STATS[commod]["workers_to_equip"] * factories
+                output = s * self.EXTRACTOR_STATS[commod]["extraction_rate"][tech] * (1 + self.ee_lvl_bonus * ee_level)
+                options.append((workers, output, s))
+
+            new_states = {}
+            for base, (output, slots) in states.items():
+                for workers, extra, s in options:
+                    if worker_cap is not None and base + workers > worker_cap:
+                        break   # Options only require more workers from here on
+                    best = new_states.get(base + workers)
+                    if best is None or best[0] < output + extra:
+                        new_states[base + workers] = (output + extra, {**slots, commod: s} if s else slots)
+            states = new_states
+
+        # Complete setups with hydros and MREs
+        setups = []
+        for base, (output, slots) in states.items():
+            try:
+                workers, hydros, mres = self.supported_workforce(base)
+            except ValueError:
+                continue    # Workforce cannot be supported at all
+            if not output or (worker_cap is not None and workers > worker_cap):
+                continue
+            setups.append(self.complete_setup(tech, ee_level, slots, self.factories_needed(tech, ee_level, slots),
+                                              workers, hydros, mres))
+
+        # Keep only setups extracting more than every setup with fewer workers
+        setups.sort(key=lambda setup: (setup.workers, -setup.output))
+        front = []
+        for setup in setups:
+            if not front or setup.output > front[-1].output:
+                front.append(setup)
+
+        if sort_by == 'credits':
+            front.sort(key=lambda setup: (setup.credits_per_month, -setup.output))
+        else:
+            front.sort(key=lambda setup: -setup.output_per_worker)
+        return front
@@ -0,0 +1,48 @@
+# Project stuff
+from bpp_bench import write_dump
+from bpp_db import BppDb
+from bpp_logic import BppLogic, DUMP_FILE
+from kit_setup import KitSetup
+
+# Test stuff
+import pytest
+
+
+@pytest.fixture
+def make_logic(tmp_path, monkeypatch):
+    """ Creates logic modules on the standard dump (in a temporary directory) holding given blueprints. """
+    monkeypatch.chdir(tmp_path)
+    modules = []
+
+    def make(blueprints=None, db_file=DUMP_FILE, **kwargs):
+        if blueprints is not None:
+            write_dump(DUMP_FILE, blueprints)
+        logic = BppLogic(db_file, **kwargs)
+        modules.append(logic)
+        return logic
+
+    yield make
+    for logic in modules:
+        logic.db.close_connection()
+
+
+@pytest.fixture
+def make_kits(tmp_path):
+    """ Creates kit setup modules on a database (in a temporary directory) with the default kit modules. """
+    databases = []
+
+    def make(ration_consumption=0.6, base_workers=None):
+        db = BppDb(str(tmp_path / 'kit{}.db'.format(len(databases))))
+        db.create_connection()
+        databases.append(db)
+        db.create_table("CREATE TABLE bpp_variables (variable TEXT PRIMARY KEY, value TEXT)")
+        db.replace_variable('exe_level_bonus', 0.02)
+        db.replace_variable('worker_ration_consumption', ration_consumption)
+        if base_workers is not None:
+            db.replace_variable('kit_base_workers', base_workers)
+        db.migrate_kit_modules()
+        return KitSetup(db)
+
+    yield make
+    for db in databases:
+        db.close_connection()
@@ -0,0 +1,37 @@
+""" Helpers shared by the tests, to build blueprints in the format of the blueprints table. """
+
+# Project stuff
+from bpp_db import BLUEPRINT_COLUMNS
+
+
+def blueprint(name, materials=(), credits=None, **columns):
+    """
+    Args:
+        name (str): Name of the blueprint, which is also its product.
+        materials (iterable): Pairs of (material, amount) required to start a build.
+        credits (int, optional): Credits required to start a build.
+        **columns (any): Values of other columns.
+
+    Returns:
+        dict: Blueprint with all columns of BLUEPRINT_COLUMNS.
+    """
+    bp = dict.fromkeys(BLUEPRINT_COLUMNS)
+    bp.update(blueprint=name, products=name, init_credits=credits)
+    if materials:
+        bp['init_materials'] = '[{}]'.format(', '.join(mat for mat, _ in materials))
+        bp['init_materials_n'] = '[{}]'.format(', '.join(str(n) for _, n in materials))
+    bp.update(columns)
+    return bp
+
+
+def chain(depth):
+    """
+    Args:
+        depth (int): Number of blueprints in the chain.
+
+    Returns:
+        list: Blueprints where every blueprint requires the product of the next one and some Metals.
+    """
+    return [blueprint('Part {}'.format(i), [('Part {}'.format(i + 1) if i + 1 < depth else 'Silicon', 1),
+                                            ('Metals', 2)])
+            for i in range(depth)]
@@ -0,0 +1,68 @@
+# Project stuff
+from helpers import blueprint
+
+# Test stuff
+import pytest
+
+BLUEPRINTS = [blueprint('Gun', [('Metals', 1)], tech=i, source='Shop' if i % 2 else 'Drop') for i in range(1, 6)]\
+    + [blueprint('Armour', [('Metals', 1)], tech=3, source='Shop'),
+       blueprint('Gun 100%', [('Silicon', 1)], tech=4, source='Shop'),
+       blueprint('Gun_X', [('Silicon', 1)], tech=5, source='Drop'),
+       blueprint('Gun 10X', [('Metals', 1)], tech=6, source='Shop'),
+       blueprint('Zapper', [('Silicon', 1)], tech=2, source='Shop')]
+
+
+def all_pages(db, filters=None, limit=2):
+    """
+    Args:
+        db (BppDb): Database to browse.
+        filters (dict, optional): Filters as keyword arguments of filter_clause.
+        limit (int): Blueprints per page.
+
+    Returns:
+        list: Rows of all pages, in order.
+    """
+    rows = []
+    page = db.get_blueprint_page(filters, limit=limit)
+    while page:
+        rows += page
+        page = db.get_blueprint_page(filters, after=(page[-1][1], page[-1][0]), limit=limit)
+    return rows
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 4])
+def test_pages_cover_duplicate_names_once(make_logic, limit):
+    db = make_logic(BLUEPRINTS).db
+
+    rows = all_pages(db, limit=limit)
+    assert rows == db.get_blueprint_page(limit=len(BLUEPRINTS))
+    assert len({row[0] for row in rows}) == len(BLUEPRINTS)
+    assert [row[1] for row in rows] == sorted(bp['blueprint'] for bp in BLUEPRINTS)
+    # Same names are ordered by id, so a page boundary between them loses or repeats nothing
+    guns = [row[0] for row in rows if row[1] == 'Gun']
+    assert len(guns) == 5 and guns == sorted(guns)
+
+
+def test_pages_continue_within_filters(make_logic):
+    db = make_logic(BLUEPRINTS).db
+    filters = {'tech_min': 2, 'tech_max': 5, 'source': 'Shop', 'material': 'Metals'}
+
+    rows = all_pages(db, filters)
+    assert [(row[1], row[2], row[3]) for row in rows] == [('Armour', 3, 'Shop'), ('Gun', 3, 'Shop'),
+                                                          ('Gun', 5, 'Shop')]
+    assert db.count_blueprints(filters) == 3
+    # A page after the last matching blueprint is empty, even though other blueprints follow it
+    assert db.get_blueprint_page(filters, after=(rows[-1][1], rows[-1][0])) == []
+
+
+@pytest.mark.parametrize('text, names', [('%', ['Gun 100%']),
+                                         ('_', ['Gun_X']),
+                                         ('0%', ['Gun 100%']),
+                                         ('n_x', ['Gun_X']),
+                                         ('1_x', []),
+                                         ('GUN 10', ['Gun 100%', 'Gun 10X'])])
+def test_text_filter_matches_wildcards_literally(make_logic, text, names):
+    db = make_logic(BLUEPRINTS).db
+
+    assert sorted(row[1] for row in all_pages(db, {'text': text})) == sorted(names)
+    assert db.count_blueprints({'text': text}) == len(names)
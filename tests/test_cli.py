@@ -0,0 +1,36 @@
+# Project stuff
+from bpp_cli import run_jobs
+
+# Standard library stuff
+from io import StringIO
+from json import loads
+
+
+class MissingBlueprints:
+    """ Logic module without any blueprints. """
+
+    def calculate_bulk_cost(self, bp_name, n):
+        raise KeyError('Blueprint {} not found!'.format(bp_name))
+
+    def calculate_build_order(self, order):
+        return {'Metals': 1 / 0}
+
+
+def test_errors_are_reported_verbatim():
+    out = StringIO()
+    failed = run_jobs(MissingBlueprints(), ['exe tech=abc', 'cost "Missing Part"'], out)
+
+    results = [loads(line) for line in out.getvalue().splitlines()]
+    assert failed == 2
+    assert results[0]['error'] == "invalid literal for int() with base 10: 'abc'"
+    assert results[1]['error'] == 'Blueprint Missing Part not found!'
+
+
+def test_unexpected_errors_do_not_stop_the_stream():
+    out = StringIO()
+    failed = run_jobs(MissingBlueprints(), ['order Girder 2', 'exe tech=abc'], out)
+
+    results = [loads(line) for line in out.getvalue().splitlines()]
+    assert failed == 2
+    assert results[0] == {'error': 'ZeroDivisionError: division by zero', 'job': 'order Girder 2'}
+    assert 'error' in results[1]
@@ -0,0 +1,54 @@
+# Project stuff
+from bpp_cli import run_jobs
+from helpers import blueprint, chain
+
+# Standard library stuff
+from io import StringIO
+from json import loads
+
+# Test stuff
+import pytest
+
+# Top requires 1 Sub per build, both have a discounted and an undiscounted material
+BLUEPRINTS = [blueprint('Top', [('Sub', 1), ('Metals', 10), ('Silicon', 10)],
+                        init_materials_discount='[True, True, False]'),
+              blueprint('Sub', [('Metals', 4), ('Silicon', 4)], init_materials_discount='[True, False]')]
+
+
+def with_discount(logic, exponent):
+    """ Sets the bulk discount exponent of the database of a logic module. """
+    logic.db.replace_variable('bulk_discount_exponent', exponent)
+    logic.database_updated()
+    return logic
+
+
+def test_bulk_discount_applies_to_flagged_materials_and_sub_builds(make_logic):
+    logic = with_discount(make_logic(BLUEPRINTS), 0.5)
+
+    # 4 builds of Top cost 4 ** 0.5 = 2 times its discounted materials, including 2 (bulk) builds of Sub,
+    # which cost 2 ** 0.5 times the discounted materials of Sub
+    cost = logic.calculate_bulk_cost('Top', 4)
+    assert cost == pytest.approx({'Metals': 10 * 2 + 4 * 2 ** 0.5, 'Silicon': 10 * 4 + 4 * 2})
+    # Single builds are not discounted
+    assert logic.calculate_bulk_cost('Top', 1) == logic.calculate_cost('Top') == {'Metals': 14, 'Silicon': 14}
+
+
+def test_orders_and_cli_apply_bulk_discount(make_logic):
+    logic = with_discount(make_logic(BLUEPRINTS), 0.5)
+    bulk = logic.calculate_bulk_cost('Top', 4)
+
+    # Every line of an order is a bulk build of its own
+    order = logic.calculate_build_order([('Top', 4), ('Sub', 1), ('Top', 4)])
+    assert order == pytest.approx({'Metals': 2 * bulk['Metals'] + 4, 'Silicon': 2 * bulk['Silicon'] + 4})
+
+    out = StringIO()
+    assert run_jobs(logic, ['cost Top 4'], out) == 0
+    assert loads(out.getvalue())['cost'] == pytest.approx(bulk)
+
+
+def test_bulk_cost_of_deep_recipe_chain(make_logic):
+    logic = with_discount(make_logic(chain(3000)), 0.9)
+
+    # Materials of the chain are not flagged, so the discount changes nothing
+    assert logic.calculate_bulk_cost('Part 0', 5) == {'Metals': 30000, 'Silicon': 5}
+    assert logic.calculate_build_order([('Part 0', 5)]) == {'Metals': 30000, 'Silicon': 5}
@@ -0,0 +1,98 @@
+# Project stuff
+from bpp_bench import write_dump
+from bpp_db import file_hash
+from bpp_logic import DUMP_FILE
+from helpers import blueprint
+
+# Standard library stuff
+from os import remove
+
+# Test stuff
+import pytest
+
+BLUEPRINTS = [blueprint('Girder', [('Metals', 1)]), blueprint('Panel', [('Silicon', 2)])]
+# Patch bringing the dump (version 0.0, see bpp_bench.VARIABLES) to version 0.1
+PATCH = {'from': '0.0', 'to': '0.1', 'blueprints': {'added': [blueprint('Strut', [('Girder', 2)])]}}
+
+
+def add(logic, name):
+    """ Adds a blueprint requiring one Metals through the logic module. """
+    logic.add_blueprint({'name': name, 'products': name, 'init_materials': '[Metals]', 'init_materials_n': '[1]'})
+
+
+def test_cold_start_replays_journal(make_logic):
+    logic = make_logic(BLUEPRINTS)
+    add(logic, 'Custom')
+    logic.stop()
+
+    logic = make_logic()
+    assert 'Custom' in logic.get_all_blueprints()
+    assert logic.get_db_version() == '0.0c'
+
+
+def test_other_database_is_not_journaled(make_logic):
+    make_logic(BLUEPRINTS).stop()
+    other = make_logic(db_file='other.db')   # Missing, so built from the standard dump
+    add(other, 'OnlyInOther')
+    other.stop()
+
+    assert 'OnlyInOther' not in make_logic().get_all_blueprints()
+    assert 'OnlyInOther' in make_logic(db_file='other.db').get_all_blueprints()
+
+
+def test_journal_of_replaced_dump_is_discarded(make_logic, monkeypatch):
+    logic = make_logic(BLUEPRINTS)
+    add(logic, 'Custom')
+    logic.db.apply_patches([PATCH])
+    logic.record('apply_patches', patches=[PATCH])
+    logic.stop()
+
+    # New release of the dump, which already includes the patch, started without database
+    remove('bpp.db')
+    monkeypatch.setattr('bpp_bench.VARIABLES', (('db_version', '0.5'), ('exe_level_bonus', '0.02'),
+                                                ('worker_ration_consumption', '0.6')))
+    logic = make_logic(BLUEPRINTS)
+    assert logic.get_db_version() == '0.5'
+    assert sorted(logic.get_all_blueprints()) == ['Girder', 'Panel']
+    assert logic.journal.entries() == []
+    assert logic.journal.dump_hash() == file_hash(DUMP_FILE)
+
+
+def test_journal_is_compacted_at_limit(make_logic):
+    logic = make_logic(BLUEPRINTS, journal_limit=10 ** 6)
+    add(logic, 'Small')
+    logic.stop()
+    # Below the limit, the dump is left as it is
+    assert 'Small' not in open(DUMP_FILE).read()
+
+    logic = make_logic(journal_limit=100)
+    add(logic, 'Large')
+    logic.stop()
+    dump = open(DUMP_FILE).read()
+    assert 'Small' in dump and 'Large' in dump
+    assert logic.journal.entries() == []
+    assert logic.journal.dump_hash() == file_hash(DUMP_FILE)
+    # Internal bookkeeping is not part of the dump
+    assert 'bpp_origin' not in dump
+
+    logic = make_logic()
+    assert {'Small', 'Large'} <= set(logic.get_all_blueprints())
+    assert logic.journaled
+
+
+def test_patches_apply_to_their_version_only(make_logic):
+    logic = make_logic(BLUEPRINTS)
+    assert logic.db.apply_patches([PATCH])['skipped'] == 0
+    assert logic.get_db_version() == '0.1'
+
+    # Already applied, so skipped
+    result = logic.db.apply_patches([PATCH])
+    assert (result['skipped'], result['added']) == (1, 0)
+    assert logic.get_db_version() == '0.1'
+
+    # Broken chain changes nothing
+    with pytest.raises(ValueError):
+        logic.db.apply_patches([{'from': '0.1', 'to': '0.2', 'blueprints': {'removed': ['Girder']}},
+                                {'from': '0.3', 'to': '0.4'}])
+    assert logic.get_db_version() == '0.1'
+    assert 'Girder' in logic.get_all_blueprints()
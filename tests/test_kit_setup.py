@@ -0,0 +1,119 @@
+# Project stuff
+from kit_setup import MAX_WORKFORCE_STEPS
+
+# Standard library stuff
+from itertools import product
+
+# Test stuff
+import pytest
+
+# First base workforce at which the original fixed-point loop no longer converges, per ration consumption
+CONVERGENT_UNTIL = {0.5: 65816, 0.6: 46776, 0.75: 28304, 1.0: 15451}
+
+
+def fixed_point_workforce(kits, workers, max_steps=MAX_WORKFORCE_STEPS):
+    """
+    Original workforce loop, adding hydroponics and MRE factories until the workforce is stable.
+
+    Args:
+        kits (KitSetup): Kit setup providing hydros_needed and mres_needed.
+        workers (int): Workers needed for everything but hydroponics and MRE factories.
+        max_steps (int): Steps after which the loop is considered not to converge.
+
+    Returns:
+        tuple: (Workers needed, hydroponics needed, MRE factories needed), or None if the loop does not converge.
+    """
+    hydros = 0
+    mres = 1
+    workers += hydros + mres
+    h_new = kits.hydros_needed(workers)
+    mre_new = kits.mres_needed(workers)
+    for _ in range(max_steps):
+        if [hydros, mres] == [h_new, mre_new]:
+            return workers, hydros, mres
+        hydros = h_new
+        mres = mre_new
+        workers += hydros + mres
+        h_new = kits.hydros_needed(workers)
+        mre_new = kits.mres_needed(workers)
+    return None
+
+
+@pytest.mark.parametrize('ration_consumption', sorted(CONVERGENT_UNTIL))
+def test_solve_workforce_matches_fixed_point_loop(make_kits, ration_consumption):
+    kits = make_kits(ration_consumption)
+    limit = CONVERGENT_UNTIL[ration_consumption]
+
+    for workers in range(limit):
+        assert kits.solve_workforce(workers) == fixed_point_workforce(kits, workers), workers
+    # Beyond the convergent range, the loop only stabilises now and then
+    for workers in range(limit, limit + 200):
+        expected = fixed_point_workforce(kits, workers)
+        if expected is None:
+            with pytest.raises(ValueError):
+                kits.solve_workforce(workers)
+        else:
+            assert kits.solve_workforce(workers) == expected, workers
+
+
+def test_unsupported_workforce_raises(make_kits):
+    kits = make_kits(0.6)
+
+    with pytest.raises(ValueError):
+        kits.solve_workforce(CONVERGENT_UNTIL[0.6])
+    with pytest.raises(ValueError):
+        kits.kit_setup('colony', 16, {'Hydroponics': 46736})
+
+
+def brute_force_front(kits, base_tech, ee_level, max_slots, worker_cap=None):
+    """
+    Pareto front of all allocations of extraction slots, calculating every allocation separately.
+
+    Args:
+        kits (KitSetup): Kit setup to calculate with.
+        base_tech (int): Kit tech level.
+        ee_level (int): Extraction Expert level.
+        max_slots (dict): Maximum slots per commodity.
+        worker_cap (int, optional): Maximum number of workers on the kit.
+
+    Returns:
+        list: (Workers, output) of the front, fewest workers first.
+    """
+    setups = []
+    for counts in product(*(range(n + 1) for n in max_slots.values())):
+        slots = {commod: n for commod, n in zip(max_slots, counts) if n}
+        try:
+            setup = kits.exe_setup(base_tech, ee_level, slots)
+        except ValueError:
+            continue
+        if setup.output and (worker_cap is None or setup.workers <= worker_cap):
+            setups.append((setup.workers, round(setup.output, 6)))
+    front = []
+    for workers, output in sorted(setups, key=lambda setup: (setup[0], -setup[1])):
+        if not front or output > front[-1][1]:
+            front.append((workers, output))
+    return front
+
+
+@pytest.mark.parametrize('worker_cap', [None, 150])
+def test_optimise_exe_setup_matches_brute_force(make_kits, worker_cap):
+    kits = make_kits()
+    max_slots = {'metals': 3, 'nuclear waste': 2, 'silicon': 2, 'space oats': 1, 'baobabs': 1}
+
+    front = kits.optimise_exe_setup(16, 30, max_slots, worker_cap)
+    assert sorted((setup.workers, round(setup.output, 6)) for setup in front)\
+        == brute_force_front(kits, 16, 30, max_slots, worker_cap)
+    for setup in front:
+        assert setup == kits.exe_setup(16, 30, setup.slots)
+    assert [setup.output_per_worker for setup in front] == sorted((s.output_per_worker for s in front), reverse=True)
+
+
+def test_optimise_exe_setup_by_credits(make_kits):
+    kits = make_kits()
+    max_slots = {'metals': 3, 'silicon': 2}
+
+    by_output = kits.optimise_exe_setup(16, 30, max_slots)
+    by_credits = kits.optimise_exe_setup(16, 30, max_slots, sort_by='credits')
+    assert sorted(by_credits, key=repr) == sorted(by_output, key=repr)
+    assert [(s.credits_per_month, -s.output) for s in by_credits]\
+        == sorted((s.credits_per_month, -s.output) for s in by_credits)
@@ -0,0 +1,50 @@
+# Project stuff
+from helpers import blueprint, chain
+
+# Test stuff
+import pytest
+
+
+def test_explode_deep_recipe_chain(make_logic):
+    logic = make_logic(chain(5000))
+
+    assert logic.calculate_cost('Part 0') == {'Metals': 10000, 'Silicon': 1}
+    assert logic.explode('Part 4990') == {'Metals': 20, 'Silicon': 1}
+
+
+def test_explode_cyclic_recipe(make_logic):
+    blueprints = chain(100)
+    blueprints[-1] = blueprint('Part 99', [('Part 0', 1)])
+    logic = make_logic(blueprints)
+
+    with pytest.raises(ValueError, match='Cyclic recipe'):
+        logic.explode('Part 0')
+
+
+def test_zero_amounts_are_rejected_per_record(make_logic):
+    logic = make_logic(chain(2))
+
+    added, errors = logic.add_blueprints([blueprint('Nothing', [('Metals', 1)], products_n='0'),
+                                          blueprint('Free', [('Metals', 0)]),
+                                          blueprint('Valid', [('Metals', 1)], products_n='2')])
+    assert added == 1
+    assert [i for i, _ in errors] == [0, 1]
+    assert all('zero amount' in message for _, message in errors)
+    assert logic.calculate_cost('Valid') == {'Metals': 1}
+
+
+def test_optimise_exe_setup_passes_ranking(make_logic):
+    logic = make_logic(chain(2))
+
+    setups = logic.optimise_exe_setup(met=3, sil=2, sort_by='credits')
+    assert setups == logic.kits.optimise_exe_setup(16, 30, {'metals': 3, 'silicon': 2}, sort_by='credits')
+    assert setups != logic.optimise_exe_setup(met=3, sil=2)
+
+
+def test_all_blueprints_are_a_copy(make_logic):
+    logic = make_logic(chain(2))
+
+    names = logic.get_all_blueprints()
+    names.clear()
+    assert logic.get_all_blueprints() == ['Part 0', 'Part 1']
+    assert logic.search_blueprints('Part') == ['Part 0', 'Part 1']
@@ -0,0 +1,75 @@
+# Project stuff
+from bpp_logic import PATCH_DIR
+from helpers import blueprint
+
+# Standard library stuff
+from json import dump
+from os import mkdir
+from os.path import join
+
+# Test stuff
+import pytest
+
+# Blueprints of the dump (version 0.0, see bpp_bench.VARIABLES)
+BLUEPRINTS = [blueprint('Girder', [('Metals', 1)]),
+              blueprint('Panel', [('Silicon', 2)]),
+              blueprint('Frame', [('Girder', 2), ('Metals', 1)])]
+
+
+def write_patches(*patches):
+    """
+    Writes patches into the patch directory (in the current directory).
+
+    Args:
+        *patches (dict): Patches (see bpp_patch).
+    """
+    mkdir(PATCH_DIR)
+    for patch in patches:
+        with open(join(PATCH_DIR, '{}_{}.json'.format(patch['from'], patch['to'])), 'w') as f:
+            dump(patch, f)
+
+
+def test_invalid_patch_changes_nothing(make_logic):
+    logic = make_logic(BLUEPRINTS)
+    write_patches({'from': '0.0', 'to': '0.1',
+                   'blueprints': {'changed': [blueprint('Girder', [('Metals', 3)])], 'removed': ['Panel']}},
+                  {'from': '0.1', 'to': '0.2',
+                   'blueprints': {'added': [blueprint('Broken', products=None)]}})
+
+    with pytest.raises(ValueError):
+        logic.check_db_version()
+    assert logic.get_db_version() == '0.0'
+    assert sorted(logic.get_all_blueprints()) == ['Frame', 'Girder', 'Panel']
+    assert logic.calculate_cost('Girder') == {'Metals': 1}
+    # Nothing was journaled either
+    logic.stop()
+    assert make_logic().get_db_version() == '0.0'
+
+
+def test_patches_keep_customisations_and_replay(make_logic):
+    logic = make_logic(BLUEPRINTS)
+    logic.add_blueprint({'name': 'Hull', 'products': 'Hull', 'init_materials': '[Frame]', 'init_materials_n': '[1]'})
+    logic.stop()
+    write_patches({'from': '0.0', 'to': '0.1',
+                   'blueprints': {'changed': [blueprint('Girder', [('Metals', 3)])],
+                                  'added': [blueprint('Hull', [('Metals', 100)])]}},
+                  {'from': '0.1', 'to': '0.2',
+                   'blueprints': {'added': [blueprint('Strut', [('Girder', 1)])], 'removed': ['Panel']},
+                   'variables': {'set': {'bulk_discount_exponent': '0.9'}}})
+
+    logic = make_logic()
+    assert logic.get_db_version() == '0.0c'
+    result = logic.check_db_version()
+    assert (result['from'], result['to']) == ('0.0c', '0.2c')
+    assert (result['added'], result['changed'], result['removed'], result['kept']) == (1, 1, 1, 1)
+    assert logic.calculate_cost('Hull') == {'Metals': 7}
+    logic.stop()
+
+    # Cold start from the dump replays the patches from the journal
+    logic = make_logic()
+    assert logic.get_db_version() == '0.2c'
+    assert logic.check_db_version() is None
+    assert sorted(logic.get_all_blueprints()) == ['Frame', 'Girder', 'Hull', 'Strut']
+    assert logic.calculate_cost('Hull') == {'Metals': 7}
+    assert logic.calculate_cost('Strut') == {'Metals': 3}
+    assert logic.discount.exponent == 0.9
@@ -0,0 +1,24 @@
+# Project stuff
+from bpp_schedule import expand_order
+from helpers import blueprint, chain
+
+# Test stuff
+import pytest
+
+
+def test_expand_deep_recipe_chain(make_logic):
+    logic = make_logic(chain(5000))
+
+    builds, deps, topo = expand_order(logic.catalog, [('Part 0', 3)])
+    assert topo[0] == 'Part 4999' and topo[-1] == 'Part 0'
+    assert deps['Part 0'] == {'Part 1'}
+    assert set(builds.values()) == {3}
+
+
+def test_expand_cyclic_recipe(make_logic):
+    blueprints = chain(100)
+    blueprints[-1] = blueprint('Part 99', [('Part 0', 1)])
+    logic = make_logic(blueprints)
+
+    with pytest.raises(ValueError, match='Cyclic recipe'):
+        expand_order(logic.catalog, [('Part 0', 1)])
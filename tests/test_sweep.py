@@ -0,0 +1,15 @@
+# Test stuff
+import pytest
+
+np = pytest.importorskip('numpy')
+from bpp_sweep import sweep_exe  # noqa: E402 (requires NumPy)
+
+
+def test_sweep_matches_exe_setup_with_custom_base_workers(make_kits):
+    kits = make_kits(base_workers=75)
+
+    for chunk in sweep_exe(kits, ee_levels=(0, 30), max_slots=5):
+        for tech, ee, commod, slots, workers, hydros, mres in zip(
+                *(chunk[col].tolist() for col in ('tech', 'ee', 'commodity', 'slots', 'workers', 'hydros', 'mres'))):
+            setup = kits.exe_setup(tech, ee, {commod: slots})
+            assert (workers, hydros, mres) == (setup.workers, setup.hydros, setup.mres)
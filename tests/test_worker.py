@@ -0,0 +1,22 @@
+# Project stuff
+from bpp_worker import CalculationWorker
+from helpers import blueprint, chain
+
+# Standard library stuff
+from queue import Queue
+
+
+def test_worker_sees_blueprints_added_through_the_app(make_logic):
+    logic = make_logic(chain(2))
+    worker = CalculationWorker(logic)
+    results = Queue()
+    worker.start()
+    try:
+        worker.submit('cost', 'calculate_bulk_cost', ('Part 0', 1), callback=results.put)
+        assert results.get(timeout=5) == {'Metals': 4, 'Silicon': 1}
+
+        logic.add_blueprints([blueprint('Frame', [('Part 0', 2)])])
+        worker.submit('cost', 'calculate_bulk_cost', ('Frame', 1), callback=results.put, error_callback=results.put)
+        assert results.get(timeout=5) == {'Metals': 8, 'Silicon': 2}
+    finally:
+        worker.stop()